@@ -0,0 +1,79 @@
+# tests/test_cache.py
+"""`IngestCache.get` con varias sesiones a la vez: un solo cálculo por clave y reintento si falla."""
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+from tiempo_sin_gestion.cache import IngestCache
+
+SESIONES = 8
+
+def wait_for_waiters(cache: IngestCache, n: int, timeout: float = 5.0):
+    """Bloquea el cálculo hasta que `n` sesiones estén esperando su resultado."""
+    limite = time.monotonic() + timeout
+    while cache.usage()["esperas"] < n:
+        assert time.monotonic() < limite, "las sesiones no llegaron a esperar el cálculo"
+        time.sleep(0.005)
+
+def run_sessions(cache: IngestCache, key: str, build, persist: bool) -> list:
+    """Lanza SESIONES llamadas simultáneas a `get`; devuelve el resultado o la excepción de cada una."""
+    barrera = threading.Barrier(SESIONES)
+
+    def session():
+        barrera.wait()
+        try:
+            return cache.get(key, build, persist)
+        except Exception as e:
+            return e
+
+    with ThreadPoolExecutor(SESIONES) as pool:
+        return list(pool.map(lambda _: session(), range(SESIONES)))
+
+@pytest.mark.parametrize("persist", [True, False])
+def test_un_solo_calculo_para_sesiones_simultaneas(tmp_path, persist):
+    cache = IngestCache(str(tmp_path), 64, 64)
+    llamadas = []
+
+    def build():
+        llamadas.append(threading.get_ident())
+        wait_for_waiters(cache, SESIONES - 1)
+        return {"presencia": pd.DataFrame({"Gestor": ["Ana", "Beto"]})}
+
+    resultados = run_sessions(cache, "clave", build, persist)
+    assert len(llamadas) == 1
+    assert all(r is resultados[0] for r in resultados)
+    assert cache.usage()["calculos"] == 1
+    assert cache.usage()["en_curso"] == 0
+    assert cache.get("clave", build, persist) is resultados[0]
+    assert len(llamadas) == 1
+
+def test_reintento_tras_un_calculo_fallido(tmp_path):
+    cache = IngestCache(str(tmp_path), 64, 64)
+    llamadas = []
+
+    def build():
+        llamadas.append(threading.get_ident())
+        if len(llamadas) == 1:
+            wait_for_waiters(cache, SESIONES - 1)
+            raise OSError("disco lleno")
+        return {"presencia": pd.DataFrame({"Gestor": ["Ana"]})}
+
+    resultados = run_sessions(cache, "clave", build, True)
+    errores = [r for r in resultados if isinstance(r, Exception)]
+    correctos = [r for r in resultados if not isinstance(r, Exception)]
+    assert len(errores) == 1 and str(errores[0]) == "disco lleno"
+    assert len(llamadas) == 2
+    assert len(correctos) == SESIONES - 1
+    assert all(r is correctos[0] for r in correctos)
+    assert cache.usage()["en_curso"] == 0
+
+def test_sesion_nueva_lee_del_disco(tmp_path):
+    build = lambda: {"presencia": pd.DataFrame({"Gestor": ["Ana", "Beto"]})}
+    IngestCache(str(tmp_path), 64, 64).get("clave", build)
+    otra = IngestCache(str(tmp_path), 64, 64)
+    valor = otra.get("clave", lambda: pytest.fail("no debería recalcular"))
+    assert valor["presencia"]["Gestor"].tolist() == ["Ana", "Beto"]
+    assert otra.usage()["calculos"] == 0
@@ -0,0 +1,62 @@
+# tests/test_calc.py
+"""El cálculo columnar (`WorkCalendar` con solo descansos generales) frente a las funciones fila a fila."""
+from datetime import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from tiempo_sin_gestion.calc import minutes_excluding_breaks, split_interval_by_hours_excl_breaks
+from tiempo_sin_gestion.schedule import WorkCalendar
+
+DESCANSOS = [
+    [],
+    [(time(13, 0), time(14, 30))],
+    [(time(13, 0), time(14, 30)), (time(10, 0), time(10, 15)), (time(16, 45), time(17, 0))],
+    [(time(0, 0), time(0, 30)), (time(23, 0), time(23, 59))],
+]
+
+def intervalos(n: int, max_seg: int, seed: int) -> tuple[pd.Series, pd.Series]:
+    """Intervalos al azar con NaT, invertidos y de largo cero mezclados."""
+    rng = np.random.default_rng(seed)
+    inicio = pd.Series(pd.Timestamp("2024-03-01") + pd.to_timedelta(rng.integers(0, 30 * 86400, n), unit="s"))
+    fin = inicio + pd.to_timedelta(rng.integers(0, max_seg, n), unit="s")
+    fin[rng.random(n) < 0.05] = inicio - pd.Timedelta(minutes=7)
+    fin[rng.random(n) < 0.05] = inicio
+    inicio[rng.random(n) < 0.03] = pd.NaT
+    fin[rng.random(n) < 0.03] = pd.NaT
+    return inicio, fin
+
+@pytest.mark.parametrize("descansos", DESCANSOS)
+@pytest.mark.parametrize("max_seg", [3 * 3600, 4 * 86400], ids=["un_dia", "varios_dias"])
+def test_net_minutes_igual_a_fila_a_fila(descansos, max_seg):
+    inicio, fin = intervalos(600, max_seg, seed=len(descansos) + max_seg)
+    esperado = [minutes_excluding_breaks(s, e, descansos) for s, e in zip(inicio, fin)]
+    obtenido = WorkCalendar(breaks=tuple(descansos)).net_minutes([None] * len(inicio), inicio, fin)
+    np.testing.assert_allclose(obtenido, esperado, rtol=0, atol=1e-9)
+
+def test_net_minutes_casos_borde():
+    descansos = ((time(13, 0), time(14, 30)),)
+    inicio = pd.Series([pd.NaT, pd.Timestamp("2024-03-01 12:00"), pd.Timestamp("2024-03-01 12:00"),
+                        pd.Timestamp("2024-03-01 13:10"), pd.Timestamp("2024-03-01 12:59:30")])
+    fin = pd.Series([pd.Timestamp("2024-03-01 12:00"), pd.Timestamp("2024-03-01 11:00"),
+                     pd.Timestamp("2024-03-01 12:00"), pd.Timestamp("2024-03-01 14:00"),
+                     pd.Timestamp("2024-03-02 13:00:30")])
+    obtenido = WorkCalendar(breaks=descansos).net_minutes([None] * 5, inicio, fin)
+    np.testing.assert_allclose(obtenido, [0, 0, 0, 0, 24 * 60 + 1 - 90 - 0.5])
+
+@pytest.mark.parametrize("descansos", DESCANSOS)
+@pytest.mark.parametrize("start_h,end_h", [(6, 21), (0, 24), (9, 10), (20, 24)])
+def test_reparto_por_hora_igual_a_fila_a_fila(descansos, start_h, end_h):
+    inicio, fin = intervalos(400, 2 * 86400, seed=start_h * 100 + end_h)
+    gestor = pd.Series(np.random.default_rng(end_h).choice(["A", "B", "C"], len(inicio)))
+    esperado = pd.DataFrame(
+        [(g, h, m) for g, s, e in zip(gestor, inicio, fin)
+         for h, m in split_interval_by_hours_excl_breaks(s, e, descansos, start_h, end_h)],
+        columns=["Gestor", "hour", "minutos"],
+    ).groupby(["Gestor", "hour"])["minutos"].sum()
+
+    pos, hora, mins = WorkCalendar(breaks=tuple(descansos)).explode_hours(gestor, inicio, fin, start_h, end_h)
+    obtenido = (pd.DataFrame({"Gestor": gestor.to_numpy()[pos], "hour": hora, "minutos": mins})
+                .groupby(["Gestor", "hour"])["minutos"].sum())
+    pd.testing.assert_series_equal(obtenido, esperado, check_exact=False, rtol=0, atol=1e-9)
@@ -0,0 +1,34 @@
+# tests/test_cli.py
+import os
+
+import pytest
+
+from tiempo_sin_gestion.bench import generate_export
+from tiempo_sin_gestion.cli import main, output_stems
+
+def test_output_stems_nombres_repetidos():
+    stems = output_stems(["in/a.csv", "in/sub/a.csv", "campA/export.csv", "campB/export.csv", "in/b.csv"])
+    assert stems == {"in/a.csv": "a", "in/sub/a.csv": "sub_a", "campA/export.csv": "campA_export",
+                     "campB/export.csv": "campB_export", "in/b.csv": "b"}
+
+def test_main_rechaza_salidas_que_chocan(tmp_path, capsys):
+    generate_export(tmp_path / "a.csv", gestores=2, dias=1, llamadas_por_hora=1)
+    (tmp_path / "sub").mkdir()
+    generate_export(tmp_path / "sub_a.csv", gestores=2, dias=1, llamadas_por_hora=1)
+    generate_export(tmp_path / "sub" / "a.csv", gestores=2, dias=1, llamadas_por_hora=1)
+    with pytest.raises(SystemExit):
+        main([str(tmp_path), str(tmp_path / "sub"), "-o", str(tmp_path / "salida")])
+    assert "mismas salidas" in capsys.readouterr().err
+    assert not os.path.exists(tmp_path / "salida")
+
+def test_main_archivos_homonimos_y_columna_faltante(tmp_path, capsys):
+    for campana in ("campA", "campB"):
+        (tmp_path / campana).mkdir()
+        generate_export(tmp_path / campana / "export.csv", gestores=2, dias=1, llamadas_por_hora=2)
+    (tmp_path / "sin_gestor.csv").write_text("FchCreacion,HraCreacion,GstCodigo\n04/03/2024,08:00:00,NoContacto\n")
+    salida = tmp_path / "salida"
+    codigo = main([str(tmp_path / "campA"), str(tmp_path / "campB"), str(tmp_path / "sin_gestor.csv"),
+                   "-o", str(salida), "--formatos", "parquet", "-j", "1"])
+    assert codigo == 1
+    assert "no contiene la columna obligatoria 'Gestor'" in capsys.readouterr().err
+    assert {f.split(".")[0] for f in os.listdir(salida)} == {"campA_export", "campB_export"}
@@ -0,0 +1,124 @@
+# tests/test_cube.py
+"""Filtros sobre el cubo (`aggregate`, `detail_rows`) frente al cálculo original de la app:
+filtrar por fechas y Gestor, ordenar, desplazar y aplicar el umbral sobre las filas."""
+from datetime import date, time
+
+import pandas as pd
+import pytest
+
+from tiempo_sin_gestion.bench import generate_export
+from tiempo_sin_gestion.calc import minutes_excluding_breaks
+from tiempo_sin_gestion.cube import INTERVALOS_MIN, build_cube
+from tiempo_sin_gestion.engine import AnalysisParams, aggregate, detail_rows
+from tiempo_sin_gestion.ingest import load_export
+
+DESCANSOS = [(time(13, 0), time(14, 30))]
+
+def baseline(path, start_date, end_date, gestores, min_interval) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Resumen por Gestor y filas sin gestión tal como los calculaba la app original."""
+    df = pd.read_csv(path, encoding="latin1")
+    df["datetime"] = pd.to_datetime(df["FchCreacion"].astype(str).str.strip() + " " +
+                                    df["HraCreacion"].astype(str).str.strip(),
+                                    format="%d/%m/%Y %H:%M:%S", errors="coerce")
+    df = df.dropna(subset=["datetime", "Gestor"]).copy()
+    df["Gestor"] = df["Gestor"].astype(str).str.strip()
+    df["GstCodigo_norm"] = df["GstCodigo"].astype(str).str.strip().str.lower()
+    df = df[(df["datetime"].dt.date >= start_date) & (df["datetime"].dt.date <= end_date)].copy()
+    if gestores:
+        df = df[df["Gestor"].isin(gestores)].copy()
+    df = df.sort_values(["Gestor", "datetime"]).copy()
+    df["prev_any"] = df.groupby("Gestor")["datetime"].shift(1)
+    df_nc = df[df["GstCodigo_norm"].isin({"nocontacto", "inubicado"})].copy()
+    df_nc["minutos_netos"] = df_nc.apply(
+        lambda r: minutes_excluding_breaks(r["prev_any"], r["datetime"], DESCANSOS), axis=1)
+    df_sin = df_nc[df_nc["minutos_netos"] >= float(min_interval)].copy()
+    intentos = (df_nc.groupby("Gestor", as_index=False).size()
+                .rename(columns={"size": "intentos_nc_inu"}))
+    minutos = (df_sin.groupby("Gestor", as_index=False)["minutos_netos"].sum()
+               .rename(columns={"minutos_netos": "minutos_sin_gestion"}))
+    resumen = pd.merge(intentos, minutos, on="Gestor", how="left").fillna({"minutos_sin_gestion": 0})
+    return resumen, df_sin
+
+def compare(path, start_date, end_date, gestores, min_interval):
+    ingesta = load_export(str(path))
+    analisis = build_cube(ingesta["nc"], DESCANSOS)
+    params = AnalysisParams(min_interval=min_interval, breaks=tuple(DESCANSOS), start_date=start_date,
+                            end_date=end_date, gestores=tuple(gestores))
+    esperado, esperado_sin = baseline(path, start_date, end_date, gestores, min_interval)
+
+    resumen = aggregate(ingesta, analisis, params)["resumen_gestor"]
+    resumen = resumen.assign(Gestor=resumen["Gestor"].astype(str)).sort_values("Gestor").reset_index(drop=True)
+    esperado = esperado.sort_values("Gestor").reset_index(drop=True)
+    assert resumen["Gestor"].tolist() == esperado["Gestor"].tolist()
+    assert resumen["intentos_nc_inu"].tolist() == esperado["intentos_nc_inu"].tolist()
+    assert resumen["minutos_sin_gestion"].to_numpy() == pytest.approx(esperado["minutos_sin_gestion"].to_numpy())
+
+    df_sin = detail_rows(analisis["filas"], start_date, end_date, list(gestores), min_interval)
+    obtenido = sorted(zip(df_sin["Gestor"].astype(str), df_sin["datetime"], df_sin["minutos_sin_gestion"].round(6)))
+    assert obtenido == sorted(zip(esperado_sin["Gestor"], esperado_sin["datetime"],
+                                  esperado_sin["minutos_netos"].round(6)))
+
+@pytest.fixture(scope="module")
+def export(tmp_path_factory):
+    path = tmp_path_factory.mktemp("cubo") / "export.csv"
+    generate_export(path, gestores=6, dias=5, llamadas_por_hora=4, inicio=date(2024, 3, 4), seed=3)
+    return path
+
+@pytest.mark.parametrize("start_date, end_date", [
+    (date(2024, 3, 4), date(2024, 3, 8)),
+    (date(2024, 3, 5), date(2024, 3, 7)),
+    (date(2024, 3, 6), date(2024, 3, 6)),
+    (date(2024, 3, 8), date(2024, 3, 8)),
+])
+@pytest.mark.parametrize("gestores", [(), ("Gestor 0001",), ("Gestor 0000", "Gestor 0003", "Gestor 0005")])
+@pytest.mark.parametrize("min_interval", INTERVALOS_MIN)
+def test_filtros_igual_que_la_app(export, start_date, end_date, gestores, min_interval):
+    compare(export, start_date, end_date, gestores, min_interval)
+
+FILAS_LIMITE = [
+    # el 5 arranca en la fecha previa al rango: con start=06/03 su primer intervalo no cuenta
+    ("05/03/2024", "18:00:00", "Ana", "Promesa"),
+    ("06/03/2024", "09:00:00", "Ana", "NoContacto"),
+    ("06/03/2024", "09:05:00", "Ana", "NoContacto"),     # exactamente 5 minutos
+    ("06/03/2024", "09:09:59", "Ana", "Inubicado"),      # 4:59
+    ("06/03/2024", "09:12:59", "Ana", "NoContacto"),     # exactamente 3 minutos
+    ("06/03/2024", "09:13:59", "Ana", "Inubicado"),      # exactamente 1 minuto
+    ("06/03/2024", "09:14:58", "Ana", "NoContacto"),     # 59 segundos
+    ("06/03/2024", "12:58:00", "Ana", "Promesa"),
+    ("06/03/2024", "14:33:00", "Ana", "NoContacto"),     # 2 + 3 minutos alrededor del refrigerio
+    ("06/03/2024", "10:00:00", "Beto", "Inubicado"),
+    ("06/03/2024", "10:02:00", "Beto", "Inubicado"),     # exactamente 2 minutos
+    ("07/03/2024", "08:00:00", "Beto", "NoContacto"),    # desde el día anterior
+    ("07/03/2024", "08:04:00", "Carla", "NoContacto"),
+    ("07/03/2024", "08:09:00", "Carla", "Inubicado"),
+]
+
+@pytest.fixture(scope="module")
+def export_limites(tmp_path_factory):
+    path = tmp_path_factory.mktemp("limites") / "export.csv"
+    pd.DataFrame(FILAS_LIMITE, columns=["FchCreacion", "HraCreacion", "Gestor", "GstCodigo"]).to_csv(path, index=False)
+    return path
+
+@pytest.mark.parametrize("start_date, end_date", [
+    (date(2024, 3, 5), date(2024, 3, 7)),
+    (date(2024, 3, 6), date(2024, 3, 7)),
+    (date(2024, 3, 6), date(2024, 3, 6)),
+    (date(2024, 3, 7), date(2024, 3, 7)),
+])
+@pytest.mark.parametrize("gestores", [(), ("Ana",), ("Beto", "Carla")])
+@pytest.mark.parametrize("min_interval", INTERVALOS_MIN)
+def test_limites_de_tramo_y_fecha_previa(export_limites, start_date, end_date, gestores, min_interval):
+    compare(export_limites, start_date, end_date, gestores, min_interval)
+
+def test_limite_exacto_cuenta(export_limites):
+    ingesta = load_export(str(export_limites))
+    analisis = build_cube(ingesta["nc"], DESCANSOS)
+    df_sin = detail_rows(analisis["filas"], date(2024, 3, 6), date(2024, 3, 6), ["Ana"], 5)
+    assert sorted(df_sin["minutos_sin_gestion"].round(6)) == [5.0, 5.0]
+    df_sin = detail_rows(analisis["filas"], date(2024, 3, 6), date(2024, 3, 6), ["Ana"], 3)
+    assert sorted(df_sin["minutos_sin_gestion"].round(6)) == [3.0, 4.983333, 5.0, 5.0]
+
+@pytest.mark.parametrize("min_interval", [0, 4, 10])
+def test_intervalo_minimo_invalido(min_interval):
+    with pytest.raises(ValueError, match="min_interval debe ser uno de"):
+        AnalysisParams(min_interval=min_interval)
@@ -0,0 +1,69 @@
+# tests/test_ingest.py
+import io
+from datetime import date
+
+import pandas as pd
+import pytest
+
+from tiempo_sin_gestion.bench import generate_export
+from tiempo_sin_gestion.ingest import READ_CSV_OPTS, load_export, prepare_frame, prepare_frame_chunked
+
+@pytest.fixture
+def cronologico(tmp_path) -> str:
+    path = tmp_path / "export.csv"
+    generate_export(path, gestores=8, dias=3, llamadas_por_hora=5, seed=7)
+    return str(path)
+
+@pytest.fixture
+def desordenado(cronologico, tmp_path) -> str:
+    path = tmp_path / "desordenado.csv"
+    df = pd.read_csv(cronologico, dtype=str, encoding="latin1")
+    df.sample(frac=1, random_state=0).to_csv(path, index=False, encoding="latin1")
+    return str(path)
+
+@pytest.fixture
+def mes_primero(tmp_path) -> str:
+    """Export con fechas mes/día/año cuyos primeros días (≤ 12) también se leen como día/mes/año."""
+    path = tmp_path / "mes_primero.csv"
+    generate_export(path, gestores=6, dias=6, llamadas_por_hora=4, inicio=date(2024, 3, 10), seed=5)
+    df = pd.read_csv(path, dtype=str, encoding="latin1")
+    df["FchCreacion"] = pd.to_datetime(df["FchCreacion"], format="%d/%m/%Y").dt.strftime("%m/%d/%Y")
+    df.to_csv(path, index=False, encoding="latin1")
+    return str(path)
+
+def assert_misma_ingesta(obtenido, esperado):
+    pd.testing.assert_frame_equal(obtenido["nc"], esperado["nc"])
+    ordenar = lambda p: p.astype({"Gestor": str}).sort_values(["Gestor", "fecha"], ignore_index=True)
+    pd.testing.assert_frame_equal(ordenar(obtenido["presencia"]), ordenar(esperado["presencia"]))
+    pd.testing.assert_frame_equal(obtenido["reporte"].drop(columns="relectura_completa"),
+                                  esperado["reporte"].drop(columns="relectura_completa"))
+
+@pytest.mark.parametrize("archivo,relectura", [("cronologico", False), ("desordenado", True)])
+def test_por_bloques_igual_a_completo(archivo, relectura, request):
+    path = request.getfixturevalue(archivo)
+    completo = prepare_frame(pd.read_csv(path, **READ_CSV_OPTS))
+    por_bloques = prepare_frame_chunked(path, chunksize=700)
+    assert_misma_ingesta(por_bloques, completo)
+    assert bool(por_bloques["reporte"].iloc[0]["relectura_completa"]) is relectura
+    assert not completo["reporte"].iloc[0]["relectura_completa"]
+
+def test_por_bloques_detecta_el_formato_con_todo_el_archivo(mes_primero):
+    completo = prepare_frame(pd.read_csv(mes_primero, **READ_CSV_OPTS))
+    por_bloques = prepare_frame_chunked(mes_primero, chunksize=200)
+    assert completo["reporte"].iloc[0]["formato_fecha"] == "%m/%d/%Y"
+    assert completo["reporte"].iloc[0]["fecha_hora_invalida"] == 0
+    assert_misma_ingesta(por_bloques, completo)
+
+@pytest.mark.parametrize("chunked", [False, True], ids=["completo", "por_bloques"])
+@pytest.mark.parametrize("filas,invalidas", [
+    (["04/03/2024,,A,NoContacto", "04/03/2024,08:10:00,A,NoContacto"], 1),
+    (["04/03/2024 08:00:00,,A,NoContacto", "05/03/2024 09:00:00,,B,Inubicado"], 2),
+    ([",,A,NoContacto", ",08:10:00,B,NoContacto", "04/03/2024,08:20:00,B,NoContacto"], 2),
+], ids=["hora_vacia", "columna_hora_vacia", "fecha_vacia"])
+def test_celdas_vacias_se_cuentan_como_invalidas(filas, invalidas, chunked):
+    csv = "\n".join(["FchCreacion,HraCreacion,Gestor,GstCodigo", *filas]) + "\n"
+    ingesta = load_export(io.BytesIO(csv.encode("latin1")), chunked=chunked)
+    reporte = ingesta["reporte"].iloc[0]
+    assert reporte["filas"] == len(filas)
+    assert reporte["fecha_hora_invalida"] == invalidas
+    assert len(ingesta["nc"]) == len(filas) - invalidas
@@ -0,0 +1,130 @@
+# tests/test_live.py
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from tiempo_sin_gestion.bench import generate_export
+from tiempo_sin_gestion.cube import CUBO_DIMS, build_cube
+from tiempo_sin_gestion.ingest import load_export
+from tiempo_sin_gestion.live import LiveMonitor
+from tiempo_sin_gestion.schedule import WorkCalendar
+
+CALENDARIO = WorkCalendar(breaks=((pd.Timestamp("13:00").time(), pd.Timestamp("14:30").time()),))
+
+@pytest.fixture
+def export(tmp_path) -> list[str]:
+    """Líneas (con salto de línea) de un export sintético pequeño; la primera es la cabecera."""
+    path = tmp_path / "export.csv"
+    generate_export(path, gestores=6, dias=2, llamadas_por_hora=4, seed=3)
+    return path.read_text(encoding="latin1").splitlines(keepends=True)
+
+def escribir(path, lineas):
+    with open(path, "w", encoding="latin1", newline="") as f:
+        f.write("".join(lineas))
+
+def ordenado(cubo: pd.DataFrame, cols: list[str]) -> pd.DataFrame:
+    cubo = cubo.astype({"Gestor": str})
+    return cubo.sort_values(CUBO_DIMS, ignore_index=True)[CUBO_DIMS + cols]
+
+def assert_igual_a_lote(monitor: LiveMonitor, lineas: list[str], tmp_path):
+    escribir(tmp_path / "lote.csv", lineas)
+    ref = build_cube(load_export(str(tmp_path / "lote.csv"))["nc"], CALENDARIO)
+    snap = monitor.snapshot()
+    for clave, cols in (("cubo", ["n", "minutos"]), ("cubo_horas", ["minutos"])):
+        obtenido, esperado = ordenado(snap[clave], cols), ordenado(ref[clave], cols)
+        pd.testing.assert_frame_equal(obtenido[CUBO_DIMS], esperado[CUBO_DIMS], check_dtype=False)
+        np.testing.assert_allclose(obtenido[cols], esperado[cols])
+
+def test_archivo_que_crece_con_linea_incompleta(export, tmp_path):
+    carpeta = tmp_path / "vivo"
+    carpeta.mkdir()
+    monitor = LiveMonitor(str(carpeta), CALENDARIO)
+    path = carpeta / "a.csv"
+    escribir(path, export[:1])
+    for k in range(1, len(export), 300):
+        bloque = "".join(export[k:k + 300])
+        with open(path, "a", encoding="latin1", newline="") as f:
+            f.write(bloque[:-5])
+        monitor.poll()
+        with open(path, "a", encoding="latin1", newline="") as f:
+            f.write(bloque[-5:])
+    monitor.poll()
+    assert monitor.snapshot()["filas"] == len(export) - 1
+    assert_igual_a_lote(monitor, export, tmp_path)
+
+def test_reemplazo_atomico_con_otro_contenido(export, tmp_path):
+    path = tmp_path / "vivo.csv"
+    escribir(path, export[:500])
+    monitor = LiveMonitor(str(path), CALENDARIO)
+    monitor.poll()
+    # el marcador regenera el export: ya no empieza con lo leído
+    nuevo = export[:1] + export[250:]
+    escribir(tmp_path / "nuevo.tmp", nuevo)
+    os.replace(tmp_path / "nuevo.tmp", path)
+    monitor.poll()
+    snap = monitor.snapshot()
+    assert snap["relecturas"] == 1
+    assert snap["filas"] == len(nuevo) - 1
+    assert_igual_a_lote(monitor, nuevo, tmp_path)
+
+def test_reemplazo_atomico_que_solo_agrega(export, tmp_path):
+    """Las filas ya leídas no se vuelven a sumar: se sigue leyendo desde donde iba."""
+    path = tmp_path / "vivo.csv"
+    escribir(path, export[:500])
+    monitor = LiveMonitor(str(path), CALENDARIO)
+    monitor.poll()
+    escribir(tmp_path / "nuevo.tmp", export)
+    os.replace(tmp_path / "nuevo.tmp", path)
+    assert monitor.poll() == len(export) - 500
+    assert monitor.snapshot()["relecturas"] == 0
+    assert_igual_a_lote(monitor, export, tmp_path)
+
+@pytest.mark.parametrize("mas_largo", [False, True], ids=["mas_corto", "reescrito_mas_largo"])
+def test_truncado_en_el_mismo_archivo(export, tmp_path, mas_largo):
+    path = tmp_path / "vivo.csv"
+    escribir(path, export[:800])
+    monitor = LiveMonitor(str(path), CALENDARIO)
+    monitor.poll()
+    # se reescribe en el mismo archivo: desde la fila 400 del export original
+    nuevo = export[:1] + export[400:1300 if mas_largo else 600]
+    with open(path, "r+", encoding="latin1", newline="") as f:
+        f.truncate(0)
+        f.write("".join(nuevo))
+    monitor.poll()
+    snap = monitor.snapshot()
+    assert snap["relecturas"] == 1
+    assert snap["filas"] == len(nuevo) - 1
+    assert_igual_a_lote(monitor, nuevo, tmp_path)
+
+def test_lectura_fallida_no_avanza(export, tmp_path, monkeypatch):
+    path = tmp_path / "vivo.csv"
+    escribir(path, export[:200])
+    monitor = LiveMonitor(str(path), CALENDARIO)
+    monitor.poll()
+    escribir(path, export[:400])
+
+    def falla(*args, **kwargs):
+        raise RuntimeError("falla simulada")
+    with monkeypatch.context() as m:
+        m.setattr("tiempo_sin_gestion.live.build_cube", falla)
+        with pytest.raises(RuntimeError):
+            monitor.poll()
+    assert monitor.snapshot()["filas"] == 199
+
+    assert monitor.poll() == 200
+    assert monitor.snapshot()["filas"] == 399
+    assert_igual_a_lote(monitor, export[:400], tmp_path)
+
+def test_filas_con_hora_vacia_se_cuentan(tmp_path):
+    path = tmp_path / "vivo.csv"
+    escribir(path, ["FchCreacion,HraCreacion,Gestor,GstCodigo\n", "04/03/2024,08:00:00,A,NoContacto\n",
+                    "04/03/2024,08:30:00,A,Inubicado\n", "04/03/2024,09:00:00,A,NoContacto\n"])
+    monitor = LiveMonitor(str(path), CALENDARIO)
+    monitor.poll()
+    with open(path, "a", encoding="latin1") as f:
+        f.write("04/03/2024,,A,NoContacto\n")
+    assert monitor.poll() == 1
+    assert monitor.snapshot()["filas"] == 4
+    assert monitor.report["fecha_hora_invalida"] == 1
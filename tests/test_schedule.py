@@ -0,0 +1,52 @@
+# tests/test_schedule.py
+from datetime import date
+
+import pandas as pd
+import pytest
+
+from tiempo_sin_gestion.schedule import WorkCalendar, read_calendar
+
+# 2026-10-16 es viernes
+NOCTURNO = b"Gestor,Dia,Inicio,Fin\nA,Vie,22:00,06:00\n"
+
+def minutos(cal, inicio, fin, gestor="A"):
+    return cal.net_minutes([gestor], [pd.Timestamp(inicio)], [pd.Timestamp(fin)])[0]
+
+def test_turno_nocturno_sigue_el_dia_siguiente():
+    cal = read_calendar(NOCTURNO)
+    assert minutos(cal, "2026-10-16 22:00", "2026-10-17 06:00") == 480
+    assert minutos(cal, "2026-10-16 00:00", "2026-10-16 06:00") == 0
+    assert minutos(cal, "2026-10-17 00:00", "2026-10-17 07:00") == 360
+
+def test_turno_nocturno_de_domingo_sigue_el_lunes():
+    cal = read_calendar(b"Gestor,Dia,Inicio,Fin\nA,Dom,22:00,06:00\n")
+    assert minutos(cal, "2026-10-18 22:00", "2026-10-19 07:00") == 480
+    assert minutos(cal, "2026-10-18 00:00", "2026-10-18 06:00") == 0
+
+def test_feriado_se_aplica_por_dia_calendario():
+    cal = read_calendar(NOCTURNO)
+    cal = WorkCalendar(turnos=cal.turnos, feriados=(("*", date(2026, 10, 17)),))
+    assert minutos(cal, "2026-10-16 22:00", "2026-10-17 06:00") == 120
+    cal = WorkCalendar(turnos=cal.turnos, feriados=(("*", date(2026, 10, 16)),))
+    assert minutos(cal, "2026-10-16 22:00", "2026-10-17 06:00") == 360
+
+def test_descanso_propio_nocturno():
+    cal = read_calendar(NOCTURNO)
+    cal = WorkCalendar(turnos=cal.turnos, descansos=(("A", 4, pd.Timestamp("23:30").time(),
+                                                      pd.Timestamp("00:30").time()),))
+    assert minutos(cal, "2026-10-16 22:00", "2026-10-17 06:00") == 420
+
+def test_turno_de_24_horas():
+    cal = read_calendar(b"Gestor,Dia,Inicio,Fin\nA,Vie,00:00,00:00\n")
+    assert minutos(cal, "2026-10-16 00:00", "2026-10-18 00:00") == 24 * 60
+
+def test_descanso_que_cruza_medianoche_se_rechaza():
+    with pytest.raises(ValueError, match="fila 2"):
+        read_calendar(b"Gestor,Dia,Inicio,Fin,Tipo\nA,Vie,23:00,01:00,descanso\n")
+
+def test_explode_hours_turno_nocturno():
+    cal = read_calendar(NOCTURNO)
+    pos, hora, mins = cal.explode_hours(["A"], [pd.Timestamp("2026-10-16 20:00")],
+                                        [pd.Timestamp("2026-10-17 08:00")], 0, 24)
+    assert sorted(hora.tolist()) == [0, 1, 2, 3, 4, 5, 22, 23]
+    assert mins.sum() == 480
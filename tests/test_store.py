@@ -0,0 +1,24 @@
+# tests/test_store.py
+import json
+
+from tiempo_sin_gestion.bench import generate_export
+from tiempo_sin_gestion.ingest import content_digest, read_rows
+from tiempo_sin_gestion.store import LocalStore
+
+def test_cargas_registran_los_formatos(tmp_path):
+    path = tmp_path / "export.csv"
+    generate_export(path, gestores=3, dias=2, llamadas_por_hora=2, seed=1)
+    digest = content_digest(path.read_bytes())
+    store = LocalStore(str(tmp_path / "almacen"))
+    assert store.loaded_formats(digest) == []
+
+    filas, reporte = read_rows(str(path), "%m/%d/%Y")
+    store.append(filas, digest, reporte)
+    assert store.loaded_formats(digest) == [("%m/%d/%Y", "%H:%M:%S")]
+    filas, reporte = read_rows(str(path))
+    store.append(filas, digest, reporte)
+    assert store.loaded_formats(digest) == [("%m/%d/%Y", "%H:%M:%S"), ("%d/%m/%Y", "%H:%M:%S")]
+
+def test_almacen_anterior_sin_formatos(tmp_path):
+    (tmp_path / "meta.json").write_text(json.dumps({"version": 3, "digests": ["abc"]}))
+    assert LocalStore(str(tmp_path)).loaded_formats("abc") == [(None, None)]
@@ -0,0 +1,18 @@
+# tiempo_sin_gestion/__init__.py
+"""Cálculo de tiempo sin gestión telefónica, independiente de la interfaz."""
+from .cache import IngestCache
+from .calc import fmt_hhmm_from_minutes
+from .cube import INTERVALOS_MIN, build_cube, cube_masks, load_cube
+from .engine import AnalysisParams, aggregate, export_results, run_file
+from .ingest import ingest_key, load_export, load_prepared
+from .live import LiveMonitor
+from .perf import StageRecorder, stage
+from .schedule import WorkCalendar, read_calendar
+from .store import LocalStore
+
+__all__ = [
+    "AnalysisParams", "INTERVALOS_MIN", "IngestCache", "LiveMonitor", "LocalStore", "StageRecorder", "WorkCalendar",
+    "aggregate", "build_cube", "cube_masks", "export_results", "fmt_hhmm_from_minutes",
+    "ingest_key", "load_cube", "load_export", "load_prepared",
+    "read_calendar", "run_file", "stage",
+]
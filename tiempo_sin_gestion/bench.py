@@ -0,0 +1,228 @@
+# tiempo_sin_gestion/bench.py
+"""Generador de exports sintéticos y benchmark etapa por etapa.
+
+    python -m tiempo_sin_gestion.bench generar export.csv --gestores 50 --dias 30
+    python -m tiempo_sin_gestion.bench medir --tamanos 10k 100k 1M 10M -o bench.json
+    python -m tiempo_sin_gestion.bench comparar base.json bench.json --tolerancia 0.2
+"""
+import argparse
+from dataclasses import asdict
+from datetime import date, datetime, timezone
+import io
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time as _time
+
+import numpy as np
+import pandas as pd
+
+from .cube import build_cube
+from .engine import DEFAULT_BREAKS, AnalysisParams, gestor_summary, hour_matrix, style_matrix, write_matrix_excel
+from .ingest import load_export
+from .perf import StageRecorder
+
+REPORTE_VERSION = 1
+CODIGOS_OTROS = ["Contacto", "PDP", "Mensaje", "Volver a llamar"]
+HORA_INICIO_JORNADA, HORA_FIN_JORNADA = 8, 20
+FILAS_POR_BLOQUE = 1_000_000
+
+# ========= Generador =========
+def _hhmmss_table() -> np.ndarray:
+    s = np.arange(86400)
+    return np.char.add(np.char.add(np.char.zfill((s // 3600).astype(str), 2), ":"),
+                       np.char.add(np.char.add(np.char.zfill((s // 60 % 60).astype(str), 2), ":"),
+                                   np.char.zfill((s % 60).astype(str), 2))).astype(object)
+
+def generate_export(target, gestores: int = 20, dias: int = 5, llamadas_por_hora: int = 12,
+                    p_nocontacto: float = 0.35, p_inubicado: float = 0.15,
+                    inicio: date = date(2024, 3, 4), seed: int = 0) -> int:
+    """Escribe un CSV con el esquema del export (FchCreacion, HraCreacion, Gestor, GstCodigo).
+
+    Cada gestor hace `llamadas_por_hora` gestiones por hora de jornada en instantes aleatorios; la
+    fracción de NoContacto/Inubicado se controla con `p_nocontacto`/`p_inubicado` y el resto se
+    reparte entre otros códigos. El archivo sale en orden cronológico, como el export real.
+    Se genera por bloques de días para acotar la memoria. Devuelve el número de filas escritas."""
+    if p_nocontacto < 0 or p_inubicado < 0 or p_nocontacto + p_inubicado > 1:
+        raise ValueError("p_nocontacto + p_inubicado debe estar entre 0 y 1")
+    rng = np.random.default_rng(seed)
+    horas = HORA_FIN_JORNADA - HORA_INICIO_JORNADA
+    por_dia = gestores * horas * llamadas_por_hora
+    dias_por_bloque = max(1, FILAS_POR_BLOQUE // max(por_dia, 1))
+    codigos = np.array(["NoContacto", "Inubicado"] + CODIGOS_OTROS, dtype=object)
+    resto = (1 - p_nocontacto - p_inubicado) / len(CODIGOS_OTROS)
+    probs = [p_nocontacto, p_inubicado] + [resto] * len(CODIGOS_OTROS)
+    nombres = np.array([f"Gestor {g:04d}" for g in range(gestores)], dtype=object)
+    hhmmss = _hhmmss_table()
+
+    total = 0
+    for d0 in range(0, dias, dias_por_bloque):
+        n_dias = min(dias_por_bloque, dias - d0)
+        n = n_dias * por_dia
+        dia = np.repeat(np.arange(n_dias), por_dia)
+        seg = rng.integers(HORA_INICIO_JORNADA * 3600, HORA_FIN_JORNADA * 3600, n)
+        orden = np.lexsort((seg, dia))
+        dia, seg = dia[orden], seg[orden]
+        fechas = np.array([(pd.Timestamp(inicio) + pd.Timedelta(days=d0 + i)).strftime("%d/%m/%Y")
+                           for i in range(n_dias)], dtype=object)
+        bloque = pd.DataFrame({
+            "FchCreacion": fechas[dia],
+            "HraCreacion": hhmmss[seg],
+            "Gestor": nombres[rng.integers(0, gestores, n)],
+            "GstCodigo": codigos[rng.choice(len(codigos), n, p=probs)],
+        })
+        bloque.to_csv(target, mode="w" if d0 == 0 else "a", header=d0 == 0, index=False, encoding="latin1")
+        total += n
+    return total
+
+def plan_size(filas: int, dias: int, llamadas_por_hora: int) -> tuple[int, int]:
+    """(gestores, días) para acercarse a `filas` con la intensidad dada; si no alcanza un gestor
+    completo, se recortan los días."""
+    por_gestor_dia = (HORA_FIN_JORNADA - HORA_INICIO_JORNADA) * llamadas_por_hora
+    gestores = max(1, round(filas / (dias * por_gestor_dia)))
+    if gestores == 1:
+        dias = max(1, round(filas / por_gestor_dia))
+    return gestores, dias
+
+# ========= Medición =========
+def bench_file(path: str, breaks=DEFAULT_BREAKS, min_interval: int = 5, track_memory: bool = False) -> list[dict]:
+    """Mide cada etapa del cálculo sobre un export con las mismas funciones que la app; las etapas
+    internas de la carga y del cubo salen de su propia instrumentación (ver `perf.stage`)."""
+    breaks = list(breaks)
+    rec = StageRecorder(track_memory)
+    with rec.activate():
+        ingesta = load_export(path)
+        nc = ingesta["nc"]
+        with rec.stage("cubo", len(nc)) as etapa:
+            analisis = build_cube(nc, breaks)
+            etapa.filas_salida = len(analisis["cubo"])
+        cubo = analisis["cubo"]
+        a, b = cubo["fecha"].min().date(), cubo["fecha"].max().date()
+        params = AnalysisParams(min_interval=min_interval, breaks=tuple(breaks))
+        with rec.stage("matriz", len(analisis["cubo_horas"])) as etapa:
+            matriz, matriz_hhmm = hour_matrix(analisis, params, a, b)
+            etapa.filas_salida = len(matriz)
+        with rec.stage("styler_render", len(matriz)):
+            style_matrix(matriz, 30).to_html()
+        with rec.stage("export_xlsx", len(matriz)):
+            en_rango = pd.Series(True, index=cubo.index)
+            write_matrix_excel(io.BytesIO(), matriz, matriz_hhmm, gestor_summary(cubo, en_rango, en_rango))
+    return [asdict(r) for r in rec.records]
+
+def run_suite(tamanos: list[int], dias: int = 30, llamadas_por_hora: int = 12,
+              p_nocontacto: float = 0.35, p_inubicado: float = 0.15,
+              workdir: str | None = None, seed: int = 0, track_memory: bool = False, log=print) -> dict:
+    """Genera un export por tamaño, mide sus etapas y devuelve el reporte completo (serializable a JSON)."""
+    tmp = workdir or tempfile.mkdtemp(prefix="tsg-bench-")
+    os.makedirs(tmp, exist_ok=True)
+    resultados = []
+    try:
+        for filas_objetivo in tamanos:
+            gestores, d = plan_size(filas_objetivo, dias, llamadas_por_hora)
+            path = os.path.join(tmp, f"export_{filas_objetivo}.csv")
+            t0 = _time.perf_counter()
+            filas = generate_export(path, gestores, d, llamadas_por_hora, p_nocontacto, p_inubicado, seed=seed)
+            gen_secs = _time.perf_counter() - t0
+            log(f"· {filas:,} filas ({gestores} gestores × {d} días) generadas en {gen_secs:.1f} s")
+            etapas = bench_file(path, track_memory=track_memory)
+            for e in etapas:
+                pico = f"  {e['pico_mb']:>9.1f} MB" if e["pico_mb"] is not None else ""
+                log(f"    {'  ' * e['nivel']}{e['etapa']:<{22 - 2 * e['nivel']}} {e['segundos']:>9.3f} s{pico}")
+            resultados.append({"filas_objetivo": filas_objetivo, "filas": filas, "gestores": gestores, "dias": d,
+                               "bytes_csv": os.path.getsize(path), "segundos_generacion": round(gen_secs, 3),
+                               "etapas": etapas, "total_segundos": round(sum(e["segundos"] for e in etapas if e["nivel"] == 0), 4)})
+            if workdir is None:
+                os.remove(path)
+    finally:
+        if workdir is None:
+            shutil.rmtree(tmp, ignore_errors=True)
+    return {
+        "version": REPORTE_VERSION,
+        "fecha": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "entorno": {"python": platform.python_version(), "pandas": pd.__version__, "numpy": np.__version__,
+                    "plataforma": platform.platform(), "cpus": os.cpu_count()},
+        "parametros": {"dias": dias, "llamadas_por_hora": llamadas_por_hora,
+                       "p_nocontacto": p_nocontacto, "p_inubicado": p_inubicado, "seed": seed,
+                       "memoria": track_memory},
+        "resultados": resultados,
+    }
+
+def report_frame(report: dict) -> pd.DataFrame:
+    """Reporte aplanado: una fila por tamaño × etapa."""
+    return pd.DataFrame([{"filas_objetivo": r["filas_objetivo"], "filas": r["filas"], **e}
+                         for r in report["resultados"] for e in r["etapas"]]
+                        ).astype({"filas_entrada": "Int64", "filas_salida": "Int64"})
+
+def compare_reports(base: dict, nuevo: dict, tolerancia: float = 0.2, min_segundos: float = 0.05) -> pd.DataFrame:
+    """Etapas que empeoran más de `tolerancia` (relativa) frente a `base` para el mismo tamaño.
+    Se ignoran etapas por debajo de `min_segundos` en ambos reportes (ruido de medición)."""
+    cmp = report_frame(base).merge(report_frame(nuevo), on=["filas_objetivo", "etapa"], suffixes=("_base", "_nuevo"))
+    cmp = cmp[(cmp["segundos_base"] >= min_segundos) | (cmp["segundos_nuevo"] >= min_segundos)]
+    cmp["cambio"] = cmp["segundos_nuevo"] / cmp["segundos_base"].clip(lower=1e-9) - 1
+    return cmp.loc[cmp["cambio"] > tolerancia, ["filas_objetivo", "etapa", "segundos_base", "segundos_nuevo", "cambio"]]
+
+# ========= CLI =========
+def _parse_size(value: str) -> int:
+    mult = {"k": 1_000, "m": 1_000_000}.get(value[-1].lower(), 1)
+    try:
+        return int(float(value[:-1] if mult > 1 else value) * mult)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"tamaño inválido '{value}' (p. ej. 10k, 1M, 250000)")
+
+def main(argv: list[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m tiempo_sin_gestion.bench", description=__doc__.split("\n")[0])
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    mezcla = argparse.ArgumentParser(add_help=False)
+    mezcla.add_argument("--llamadas-por-hora", type=int, default=12)
+    mezcla.add_argument("--p-nocontacto", type=float, default=0.35, help="fracción de filas NoContacto")
+    mezcla.add_argument("--p-inubicado", type=float, default=0.15, help="fracción de filas Inubicado")
+    mezcla.add_argument("--seed", type=int, default=0)
+
+    g = sub.add_parser("generar", parents=[mezcla], help="escribe un export sintético")
+    g.add_argument("salida")
+    g.add_argument("--gestores", type=int, default=20)
+    g.add_argument("--dias", type=int, default=5)
+    g.add_argument("--inicio", type=date.fromisoformat, default=date(2024, 3, 4), help="primer día AAAA-MM-DD")
+
+    m = sub.add_parser("medir", parents=[mezcla], help="genera exports de varios tamaños y mide cada etapa")
+    m.add_argument("--tamanos", type=_parse_size, nargs="+", default=[10_000, 100_000, 1_000_000, 10_000_000])
+    m.add_argument("--dias", type=int, default=30, help="días por export (los gestores se ajustan al tamaño)")
+    m.add_argument("-o", "--salida", default="bench.json", help="reporte JSON (.csv para el formato plano)")
+    m.add_argument("--conservar", metavar="DIR", help="conservar los CSV generados en esta carpeta")
+    m.add_argument("--memoria", action="store_true", help="medir también el pico de memoria por etapa (más lento)")
+
+    c = sub.add_parser("comparar", help="marca las etapas que empeoran frente a un reporte base")
+    c.add_argument("base")
+    c.add_argument("nuevo")
+    c.add_argument("--tolerancia", type=float, default=0.2, help="empeoramiento relativo permitido (0.2 = 20%%)")
+
+    args = ap.parse_args(argv)
+    if args.cmd == "generar":
+        n = generate_export(args.salida, args.gestores, args.dias, args.llamadas_por_hora,
+                            args.p_nocontacto, args.p_inubicado, args.inicio, args.seed)
+        print(f"{n:,} filas → {args.salida}")
+        return 0
+    if args.cmd == "medir":
+        report = run_suite(args.tamanos, args.dias, args.llamadas_por_hora, args.p_nocontacto,
+                           args.p_inubicado, args.conservar, args.seed, args.memoria)
+        if args.salida.endswith(".csv"):
+            report_frame(report).to_csv(args.salida, index=False)
+        else:
+            with open(args.salida, "w", encoding="utf-8") as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"Reporte → {args.salida}")
+        return 0
+    with open(args.base, encoding="utf-8") as f_base, open(args.nuevo, encoding="utf-8") as f_nuevo:
+        peores = compare_reports(json.load(f_base), json.load(f_nuevo), args.tolerancia)
+    if peores.empty:
+        print("Sin regresiones.")
+        return 0
+    print(peores.to_string(index=False), file=sys.stderr)
+    return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,134 @@
+# tiempo_sin_gestion/cache.py
+"""Caché LRU de resultados preparados, en memoria y en Parquet sobre disco local.
+
+Es única por proceso: la comparten todas las sesiones, y las peticiones simultáneas de una misma clave
+se resuelven con un solo cálculo."""
+from collections import OrderedDict
+from concurrent.futures import CancelledError, Future
+import os
+import shutil
+import sys
+import threading
+
+import numpy as np
+import pandas as pd
+
+CACHE_DIR = os.environ.get("TSG_CACHE_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache"))
+CACHE_MEM_BUDGET_MB = int(os.environ.get("TSG_CACHE_MEM_MB", "512"))
+CACHE_DISK_BUDGET_MB = int(os.environ.get("TSG_CACHE_DISK_MB", "4096"))
+
+def nbytes(value) -> int:
+    """Bytes aproximados de un resultado: DataFrames, Series, arrays y contenedores de ellos."""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, (pd.Series, pd.Index)):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, dict):
+        return sum(nbytes(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(nbytes(v) for v in value)
+    return sys.getsizeof(value)
+
+class IngestCache:
+    """Caché LRU de ingestas preparadas ({nombre: DataFrame}) y de resultados derivados: copia en memoria
+    acotada por bytes (un solo límite para todo) y, para las ingestas, copia Parquet en disco."""
+
+    def __init__(self, root: str, mem_budget_mb: int, disk_budget_mb: int):
+        self.root = root
+        self.mem_budget = mem_budget_mb * 1024**2
+        self.disk_budget = disk_budget_mb * 1024**2
+        self._mem: OrderedDict[str, tuple[object, int]] = OrderedDict()
+        self._inflight: dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self.stats = {"aciertos": 0, "calculos": 0, "esperas": 0}
+
+    def get(self, key: str, build, persist: bool = True):
+        """Devuelve la ingesta de `key` (memoria → disco → `build()`); el resultado es compartido, no mutarlo.
+        Con `persist=False` solo se guarda en memoria (datos que ya viven en otro almacén en disco, o
+        resultados derivados de cualquier tipo). Si otra sesión ya está calculando `key`, se espera su
+        resultado en vez de repetir el cálculo; si ese cálculo falla o se interrumpe, lo intenta esta."""
+        while True:
+            with self._lock:
+                if key in self._mem:
+                    self._mem.move_to_end(key)
+                    self.stats["aciertos"] += 1
+                    return self._mem[key][0]
+                pending = self._inflight.get(key)
+                if pending is None:
+                    pending = self._inflight[key] = Future()
+                    break
+                self.stats["esperas"] += 1
+            try:
+                return pending.result()
+            except CancelledError:
+                continue
+        try:
+            value = self._load(key, build, persist)
+            self._put(key, value)
+        except BaseException:
+            # las sesiones en espera lo reintentan (el error, o la interrupción, es de esta sesión)
+            with self._lock:
+                del self._inflight[key]
+            pending.cancel()
+            raise
+        with self._lock:
+            del self._inflight[key]
+        pending.set_result(value)
+        return value
+
+    def _load(self, key: str, build, persist: bool):
+        path = os.path.join(self.root, key)
+        if persist and os.path.isdir(path):
+            bundle = {f[:-len(".parquet")]: pd.read_parquet(os.path.join(path, f))
+                      for f in os.listdir(path) if f.endswith(".parquet")}
+            os.utime(path)
+            return bundle
+        with self._lock:
+            self.stats["calculos"] += 1
+        value = build()
+        if persist:
+            self._write(path, value)
+        return value
+
+    def usage(self) -> dict:
+        """Estado de la caché en memoria, para el diagnóstico."""
+        with self._lock:
+            return {"entradas": len(self._mem), "mb": round(sum(sz for _, sz in self._mem.values()) / 2**20, 1),
+                    "limite_mb": round(self.mem_budget / 2**20), "en_curso": len(self._inflight), **self.stats}
+
+    def _write(self, path: str, bundle: dict[str, pd.DataFrame]):
+        tmp = f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+        os.makedirs(tmp, exist_ok=True)
+        for name, df in bundle.items():
+            df.to_parquet(os.path.join(tmp, f"{name}.parquet"), index=False)
+        try:
+            os.replace(tmp, path)
+        except OSError:
+            # otra sesión escribió la misma clave a la vez: el contenido es idéntico
+            shutil.rmtree(tmp, ignore_errors=True)
+        self._evict_disk()
+
+    def _put(self, key: str, value):
+        size = nbytes(value)
+        with self._lock:
+            self._mem[key] = (value, size)
+            self._mem.move_to_end(key)
+            used = sum(sz for _, sz in self._mem.values())
+            while used > self.mem_budget and len(self._mem) > 1:
+                _, (_, sz) = self._mem.popitem(last=False)
+                used -= sz
+
+    def _evict_disk(self):
+        def dir_size(d):
+            return sum(os.path.getsize(os.path.join(d, f)) for f in os.listdir(d))
+        dirs = [os.path.join(self.root, d) for d in os.listdir(self.root) if not d.endswith(".tmp")]
+        dirs = [d for d in dirs if os.path.isdir(d)]
+        dirs.sort(key=os.path.getmtime)
+        sizes = {d: dir_size(d) for d in dirs}
+        used = sum(sizes.values())
+        while used > self.disk_budget and len(dirs) > 1:
+            d = dirs.pop(0)
+            used -= sizes[d]
+            shutil.rmtree(d, ignore_errors=True)
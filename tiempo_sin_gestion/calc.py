@@ -0,0 +1,110 @@
+# tiempo_sin_gestion/calc.py
+"""Cálculo de minutos netos (sin descansos) y reparto por hora.
+
+El cálculo columnar que usa el motor es `schedule.WorkCalendar`; las funciones fila a fila se conservan como
+referencia contra la que se prueba (con solo descansos generales deben dar los mismos minutos)."""
+from datetime import datetime, timedelta, time
+
+import numpy as np
+import pandas as pd
+
+def fmt_hhmm_from_minutes(mins):
+    try:
+        secs = int(round(float(mins) * 60))
+    except Exception:
+        return "00:00"
+    if secs < 0: secs = 0
+    h = secs // 3600
+    m = (secs % 3600) // 60
+    return f"{h:02d}:{m:02d}"
+
+def fmt_hhmm_vec(mins) -> np.ndarray:
+    """`fmt_hhmm_from_minutes` sobre un arreglo completo (mismo redondeo; NaN/inf → 00:00).
+    Cada minuto distinto se formatea una sola vez."""
+    m = pd.to_numeric(pd.Series(mins), errors="coerce").to_numpy(dtype=float)
+    secs = np.clip(np.round(np.where(np.isfinite(m), m, 0.0) * 60), 0, None).astype(np.int64)
+    uniq, inv = np.unique(secs // 60, return_inverse=True)
+    labels = np.array([f"{v // 60:02d}:{v % 60:02d}" for v in uniq.tolist()], dtype=object)
+    return labels[inv.reshape(-1)]
+
+def minutes_excluding_breaks(start_ts: datetime, end_ts: datetime, breaks: list[tuple[time, time]]):
+    """Minutos del intervalo [start_ts, end_ts) excluyendo solapes con descansos diarios."""
+    if pd.isna(start_ts) or pd.isna(end_ts) or end_ts <= start_ts:
+        return 0.0
+    total = (end_ts - start_ts).total_seconds() / 60.0
+    if total <= 0:
+        return 0.0
+    d = start_ts.date()
+    end_d = end_ts.date()
+    overlap = 0.0
+    while d <= end_d:
+        for bstart, bend in breaks:
+            bs = datetime.combine(d, bstart)
+            be = datetime.combine(d, bend)
+            s = max(start_ts, bs)
+            e = min(end_ts, be)
+            if e > s:
+                overlap += (e - s).total_seconds() / 60.0
+        d += timedelta(days=1)
+    return max(0.0, total - overlap)
+
+def split_interval_by_hours_excl_breaks(start_ts: datetime, end_ts: datetime,
+                                        breaks: list[tuple[time, time]],
+                                        start_h: int, end_h: int):
+    """Divide [start_ts, end_ts) en bloques de 1h; devuelve (hour, minutos_netos_sin_break) por bloque."""
+    out = []
+    if pd.isna(start_ts) or pd.isna(end_ts) or end_ts <= start_ts:
+        return out
+    cur = start_ts.replace(minute=0, second=0, microsecond=0)
+    if cur > start_ts:
+        cur -= timedelta(hours=1)
+    while cur < end_ts:
+        nxt = cur + timedelta(hours=1)
+        s = max(start_ts, cur)
+        e = min(end_ts, nxt)
+        if e > s:
+            mins_block = (e - s).total_seconds() / 60.0
+            d = s.date()
+            for bstart, bend in breaks:
+                bs = datetime.combine(d, bstart)
+                be = datetime.combine(d, bend)
+                ss = max(s, bs)
+                ee = min(e, be)
+                if ee > ss:
+                    mins_block -= (ee - ss).total_seconds() / 60.0
+            mins_block = max(0.0, mins_block)
+            if start_h <= cur.hour < end_h and mins_block > 0:
+                out.append((cur.hour, mins_block))
+        cur = nxt
+    return out
+
+_NS_MIN = 60 * 10**9
+_NS_DAY = 24 * 60 * _NS_MIN
+
+def _to_ns(ts) -> np.ndarray:
+    """Convierte una serie/array datetime64 a enteros en ns (NaT -> mínimo int64)."""
+    return np.asarray(pd.to_datetime(ts), dtype="datetime64[ns]").view("i8")
+
+_NS_HOUR = 60 * _NS_MIN
+
+def hour_blocks(start, end, start_h: int, end_h: int):
+    """Bloques de 1h de los intervalos [start, end) dentro de [start_h, end_h), sin descontar nada.
+    Devuelve (posición del intervalo, hora, inicio del bloque en ns, fin del bloque en ns)."""
+    start, end = pd.Series(start), pd.Series(end)
+    valid = (start.notna() & end.notna()).to_numpy()
+    s_ns, e_ns = _to_ns(start), _to_ns(end)
+    rows = np.flatnonzero(valid & (e_ns > s_ns))
+    s_ns, e_ns = s_ns[rows], e_ns[rows]
+
+    first = s_ns // _NS_HOUR
+    n_blocks = (e_ns - 1) // _NS_HOUR - first + 1
+    idx = np.repeat(np.arange(len(s_ns)), n_blocks)
+    offset = np.arange(len(idx)) - np.repeat(np.cumsum(n_blocks) - n_blocks, n_blocks)
+    block = first[idx] + offset
+    hour = block % 24
+    keep = (hour >= start_h) & (hour < end_h)
+    idx, block, hour = idx[keep], block[keep], hour[keep]
+
+    bs = np.maximum(s_ns[idx], block * _NS_HOUR)
+    be = np.minimum(e_ns[idx], (block + 1) * _NS_HOUR)
+    return rows[idx], hour, bs, be
@@ -0,0 +1,136 @@
+# tiempo_sin_gestion/cli.py
+"""Procesamiento por lotes de exports CSV sin Streamlit.
+
+    python -m tiempo_sin_gestion exports/*.csv -o salida -j 4
+"""
+import argparse
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import replace
+from datetime import date, datetime, time
+import glob
+import os
+import sys
+
+from .engine import FORMATOS_SALIDA, AnalysisParams, run_file
+from .ingest import FORMATOS_FECHA, FORMATOS_HORA
+from .schedule import TODOS, WorkCalendar, read_calendar
+
+def _parse_break(value: str) -> tuple[time, time]:
+    try:
+        ini, fin = (datetime.strptime(v.strip(), "%H:%M").time() for v in value.split("-"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"refrigerio inválido '{value}' (use HH:MM-HH:MM)")
+    if fin <= ini:
+        raise argparse.ArgumentTypeError(f"el fin del refrigerio debe ser mayor que el inicio: '{value}'")
+    return ini, fin
+
+def _parse_date(value: str) -> date:
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"fecha inválida '{value}' (use AAAA-MM-DD)")
+
+def expand_inputs(paths: list[str]) -> list[str]:
+    """Archivos CSV a procesar: rutas sueltas, patrones glob o carpetas (se toman sus *.csv)."""
+    files = []
+    for p in paths:
+        if os.path.isdir(p):
+            files.extend(sorted(glob.glob(os.path.join(p, "*.csv"))))
+        else:
+            files.extend(sorted(glob.glob(p)) or [p])
+    return list(dict.fromkeys(files))
+
+def output_stems(files: list[str]) -> dict[str, str]:
+    """Nombre base de las salidas de cada archivo: su nombre sin extensión o, si varios se llaman igual
+    (p. ej. campA/export.csv y campB/export.csv), su ruta desde la carpeta común (campA_export, campB_export)."""
+    nombre = lambda f: os.path.splitext(os.path.basename(f))[0]
+    grupos = defaultdict(list)
+    for f in files:
+        grupos[nombre(f).lower()].append(f)
+    stems = {}
+    for grupo in grupos.values():
+        if len(grupo) == 1:
+            stems[grupo[0]] = nombre(grupo[0])
+            continue
+        base = os.path.commonpath([os.path.dirname(os.path.abspath(f)) for f in grupo])
+        for f in grupo:
+            stems[f] = os.path.splitext(os.path.relpath(os.path.abspath(f), base))[0].replace(os.sep, "_")
+    return stems
+
+def build_parser() -> argparse.ArgumentParser:
+    ap = argparse.ArgumentParser(prog="python -m tiempo_sin_gestion",
+                                 description="Tiempo sin gestión telefónica por Gestor, por lotes.")
+    ap.add_argument("entradas", nargs="+", help="archivos CSV, patrones glob o carpetas")
+    ap.add_argument("-o", "--salida", default="salida", help="carpeta de salida (por defecto: ./salida)")
+    ap.add_argument("-j", "--procesos", type=int, default=os.cpu_count() or 1,
+                    help="archivos procesados en paralelo (por defecto: núcleos disponibles)")
+    ap.add_argument("--formatos", nargs="+", choices=FORMATOS_SALIDA, default=list(FORMATOS_SALIDA))
+    ap.add_argument("--intervalo-min", type=int, choices=[1, 2, 3, 5], default=5,
+                    help="intervalo mínimo en minutos (por defecto: 5)")
+    ap.add_argument("--refrigerio", type=_parse_break, action="append", metavar="HH:MM-HH:MM",
+                    help="horario excluido; se puede repetir (por defecto: 13:00-14:30)")
+    ap.add_argument("--sin-refrigerio", action="store_true", help="no excluir ningún horario")
+    ap.add_argument("--turnos", metavar="CSV",
+                    help="turnos por gestor: columnas Gestor, Dia, Inicio, Fin y opcional Tipo (turno/descanso/feriado)")
+    ap.add_argument("--feriado", type=_parse_date, action="append", default=[], metavar="AAAA-MM-DD",
+                    help="día sin tiempo laborable para todos; se puede repetir")
+    ap.add_argument("--desde", type=_parse_date, help="fecha inicial AAAA-MM-DD (por defecto: la primera del archivo)")
+    ap.add_argument("--hasta", type=_parse_date, help="fecha final AAAA-MM-DD (por defecto: la última del archivo)")
+    ap.add_argument("--gestor", action="append", default=[], help="limitar a este Gestor; se puede repetir")
+    ap.add_argument("--hora-inicio", type=int, default=6, help="primera hora de la matriz (0–23)")
+    ap.add_argument("--hora-fin", type=int, default=21, help="hora fin de la matriz (1–24)")
+    ap.add_argument("--sin-solapamiento", action="store_true",
+                    help="asignar cada intervalo a la hora de la fila en vez de repartirlo entre las horas que cruza")
+    ap.add_argument("--por-bloques", action="store_true", help="leer cada CSV por bloques (menos memoria)")
+    ap.add_argument("--formato-fecha", help=f"formato de FchCreacion, p. ej. {FORMATOS_FECHA[0]} (por defecto: automático)")
+    ap.add_argument("--formato-hora", help=f"formato de HraCreacion, p. ej. {FORMATOS_HORA[0]} (por defecto: automático)")
+    return ap
+
+def main(argv: list[str] | None = None) -> int:
+    ap = build_parser()
+    args = ap.parse_args(argv)
+    if not 0 <= args.hora_inicio < args.hora_fin <= 24:
+        ap.error("se requiere 0 <= --hora-inicio < --hora-fin <= 24")
+    if args.desde and args.hasta and args.desde > args.hasta:
+        ap.error("--desde no puede ser posterior a --hasta")
+    breaks = () if args.sin_refrigerio else tuple(args.refrigerio or AnalysisParams.breaks)
+    try:
+        calendario = read_calendar(args.turnos) if args.turnos else WorkCalendar()
+    except (OSError, ValueError) as e:
+        ap.error(str(e))
+    calendario = replace(calendario, feriados=calendario.feriados + tuple((TODOS, f) for f in args.feriado))
+    params = AnalysisParams(min_interval=args.intervalo_min, breaks=breaks, calendario=calendario,
+                            start_date=args.desde, end_date=args.hasta, gestores=tuple(args.gestor),
+                            start_h=args.hora_inicio, end_h=args.hora_fin, overlap=not args.sin_solapamiento)
+    files = expand_inputs(args.entradas)
+    stems = output_stems(files)
+    repetidos = defaultdict(list)
+    for f, stem in stems.items():
+        repetidos[stem.lower()].append(f)
+    for grupo in repetidos.values():
+        if len(grupo) > 1:
+            ap.error(f"estos archivos escribirían las mismas salidas en {args.salida}: {', '.join(grupo)}")
+    opts = dict(formats=tuple(args.formatos), chunked=args.por_bloques,
+                fmt_fecha=args.formato_fecha, fmt_hora=args.formato_hora)
+
+    fallos = 0
+    with ProcessPoolExecutor(max_workers=max(1, min(args.procesos, len(files)))) as pool:
+        futures = {pool.submit(run_file, f, params, args.salida, stem=stems[f], **opts): f for f in files}
+        for fut in as_completed(futures):
+            try:
+                r = fut.result()
+            except KeyError as e:
+                fallos += 1
+                print(f"✗ {futures[fut]}: el archivo no contiene la columna obligatoria '{e.args[0]}'", file=sys.stderr)
+                continue
+            except Exception as e:
+                fallos += 1
+                print(f"✗ {futures[fut]}: {e}", file=sys.stderr)
+                continue
+            print(f"✓ {r['archivo']} → {stems[r['archivo']]}.*: {r['filas']:,} filas ({r['filas_excluidas']:,} excluidas), "
+                  f"{r['gestores']} gestores, {r['minutos_sin_gestion']:,.1f} min sin gestión en {r['segundos']} s")
+            if r["relectura_completa"]:
+                print(f"  {r['archivo']}: no está en orden cronológico por Gestor; se leyó completo, no por bloques",
+                      file=sys.stderr)
+    return 1 if fallos else 0
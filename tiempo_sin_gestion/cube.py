@@ -0,0 +1,75 @@
+# tiempo_sin_gestion/cube.py
+"""Cubo Gestor × día × hora × tramo de duración y su filtrado."""
+from datetime import time
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+from .cache import IngestCache
+from .perf import stage
+from .schedule import WorkCalendar, as_calendar
+
+INTERVALOS_MIN = [1, 2, 3, 5]
+DIAS_SEMANA = {0: "Lun", 1: "Mar", 2: "Mié", 3: "Jue", 4: "Vie", 5: "Sáb", 6: "Dom"}
+CUBO_DIMS = ["Gestor", "fecha", "fecha_prev", "hora", "tramo"]
+
+def tramo_minimo(min_interval: int) -> int:
+    """Primer tramo de duración que cumple `minutos >= min_interval` (tramo 0 = menos de 1 minuto)."""
+    return INTERVALOS_MIN.index(min_interval) + 1
+
+def build_cube(nc: pd.DataFrame, calendario: WorkCalendar | list[tuple[time, time]]) -> dict[str, pd.DataFrame]:
+    """Precalcula los minutos netos (laborables según `calendario` o, por compatibilidad, una lista de
+    descansos) de cada fila NC/IN y los agrega en dos cubos:
+
+    - `cubo`: (Gestor, fecha, fecha_prev, hora de la fila, tramo de duración) → intentos y minutos;
+    - `cubo_horas`: lo mismo pero con los minutos repartidos por la hora en que transcurren.
+
+    `fecha_prev` es el día de la gestión previa: al filtrar desde una fecha `a`, los intervalos cuya
+    gestión previa es anterior a `a` no cuentan (igual que si se desplazara el set filtrado)."""
+    cal = as_calendar(calendario)
+    with stage("minutos_netos", len(nc)):
+        filas = nc.copy()
+        filas["minutos_netos"] = cal.net_minutes(filas["Gestor"], filas["prev_any"], filas["datetime"])
+        tramo = np.searchsorted(INTERVALOS_MIN, filas["minutos_netos"].to_numpy(), side="right").astype("int8")
+
+    with stage("cubo_dia_hora", len(filas)) as etapa:
+        dims = pd.DataFrame({
+            "Gestor": filas["Gestor"],
+            "fecha": filas["datetime"].dt.normalize(),
+            "fecha_prev": filas["prev_any"].dt.normalize(),
+            "hora": filas["datetime"].dt.hour.astype("int8"),
+            "tramo": tramo,
+        })
+        cubo = (dims.assign(n=1, minutos=filas["minutos_netos"])
+                .groupby(CUBO_DIMS, observed=True, dropna=False, as_index=False)[["n", "minutos"]].sum())
+        etapa.filas_salida = len(cubo)
+
+    with stage("reparto_horas", len(filas)) as etapa:
+        pos, hour, mins = cal.explode_hours(filas["Gestor"], filas["prev_any"], filas["datetime"], 0, 24)
+        sel = tramo[pos] > 0
+        horas = dims.iloc[pos[sel]].reset_index(drop=True)
+        horas["hora"] = hour[sel].astype("int8")
+        horas["minutos"] = mins[sel]
+        cubo_horas = horas.groupby(CUBO_DIMS, observed=True, dropna=False, as_index=False)["minutos"].sum()
+        etapa.filas_salida = len(cubo_horas)
+    return {"filas": filas, "cubo": cubo, "cubo_horas": cubo_horas}
+
+def breaks_signature(calendario: WorkCalendar | list[tuple[time, time]]) -> str:
+    """Identificador corto y estable de una configuración de descansos o de un calendario laboral."""
+    return as_calendar(calendario).signature()
+
+def load_cube(key: str, nc: pd.DataFrame, calendario: WorkCalendar | list[tuple[time, time]],
+              cache: IngestCache) -> dict[str, pd.DataFrame]:
+    """`build_cube` cacheado por ingesta + calendario laboral."""
+    cube_key = hashlib.sha256(f"{key}|cubo|{breaks_signature(calendario)}".encode()).hexdigest()[:32]
+    return cache.get(cube_key, lambda: build_cube(nc, calendario))
+
+def cube_masks(cubo: pd.DataFrame, start_date, end_date, gestores, min_interval: int) -> tuple[pd.Series, pd.Series]:
+    """Máscaras sobre el cubo: celdas dentro del filtro (intentos) y celdas que además cumplen el umbral (minutos)."""
+    a, b = pd.Timestamp(start_date), pd.Timestamp(end_date)
+    en_rango = (cubo["fecha"] >= a) & (cubo["fecha"] <= b)
+    if gestores:
+        en_rango &= cubo["Gestor"].isin(gestores)
+    cuenta = en_rango & (cubo["fecha_prev"] >= a) & (cubo["tramo"] >= tramo_minimo(min_interval))
+    return en_rango, cuenta
@@ -0,0 +1,236 @@
+# tiempo_sin_gestion/engine.py
+"""Motor sin interfaz: carga → preparación → brechas → agregados → exportación.
+
+Lo usan tanto la app de Streamlit como la línea de comandos (`python -m tiempo_sin_gestion`)."""
+from dataclasses import dataclass, field
+from datetime import date, time
+import os
+import time as _time
+
+import numpy as np
+import pandas as pd
+
+from .calc import fmt_hhmm_from_minutes, fmt_hhmm_vec
+from .cube import DIAS_SEMANA, INTERVALOS_MIN, build_cube, cube_masks
+from .export import write_parquet_chunked, write_xlsx_streaming
+from .ingest import load_export
+from .schedule import WorkCalendar
+
+DEFAULT_BREAKS = ((time(13, 0), time(14, 30)),)
+FORMATOS_SALIDA = ("parquet", "xlsx")
+COLUMNAS_DETALLE = ["Gestor", "datetime", "GstCodigo", "intervalo_hhmm", "hhmm", "minutos_sin_gestion"]
+
+@dataclass(frozen=True)
+class AnalysisParams:
+    """Parámetros de análisis equivalentes a los controles de la app."""
+    min_interval: int = 5
+    breaks: tuple[tuple[time, time], ...] = DEFAULT_BREAKS
+    start_date: date | None = None
+    end_date: date | None = None
+    gestores: tuple[str, ...] = field(default_factory=tuple)
+    start_h: int = 6
+    end_h: int = 21
+    overlap: bool = True
+    # turnos, descansos propios y feriados; los descansos generales siguen en `breaks`
+    calendario: WorkCalendar | None = None
+
+    def __post_init__(self):
+        if self.min_interval not in INTERVALOS_MIN:
+            raise ValueError(f"min_interval debe ser uno de {INTERVALOS_MIN} (se recibió {self.min_interval!r})")
+
+    def work_calendar(self) -> WorkCalendar:
+        return (self.calendario or WorkCalendar()).with_breaks(self.breaks)
+
+def date_bounds(presencia: pd.DataFrame) -> tuple[date, date]:
+    return presencia["fecha"].min().date(), presencia["fecha"].max().date()
+
+def gestor_summary(cubo: pd.DataFrame, en_rango: pd.Series, cuenta: pd.Series) -> pd.DataFrame:
+    """Intentos NC/IN y minutos sin gestión por Gestor (resumen de KPIs, barras y tarjetas)."""
+    intentos_por_gestor = (cubo[en_rango].groupby("Gestor", as_index=False, observed=True)["n"].sum()
+                           .rename(columns={"n": "intentos_nc_inu"}))
+    tot_por_gestor = (cubo[cuenta].groupby("Gestor", as_index=False, observed=True)["minutos"].sum()
+                      .rename(columns={"minutos": "minutos_sin_gestion"})
+                      .sort_values("minutos_sin_gestion", ascending=False))
+    resumen = pd.merge(intentos_por_gestor, tot_por_gestor, on="Gestor", how="left").fillna({"minutos_sin_gestion": 0})
+    resumen["hhmm_total"] = fmt_hhmm_vec(resumen["minutos_sin_gestion"])
+    return resumen
+
+def heatmap_table(cubo: pd.DataFrame, cuenta: pd.Series) -> pd.DataFrame:
+    """Minutos sin gestión por día de la semana × hora de la fila."""
+    tmp = cubo.loc[cuenta, ["fecha", "hora", "minutos"]].rename(columns={"minutos": "minutos_sin_gestion"})
+    tmp["hora"] = tmp["hora"].astype(int)
+    tmp["weekday_num"] = tmp["fecha"].dt.weekday
+    tmp["dia_semana"] = tmp["weekday_num"].map(DIAS_SEMANA)
+    heat = tmp.groupby(["dia_semana", "weekday_num", "hora"], as_index=False)["minutos_sin_gestion"].sum()
+    heat["hhmm"] = fmt_hhmm_vec(heat["minutos_sin_gestion"])
+    return heat
+
+def hour_matrix(analisis: dict[str, pd.DataFrame], params: AnalysisParams,
+                start_date: date, end_date: date) -> tuple[pd.DataFrame, pd.DataFrame] | None:
+    """Matriz Gestor × rango horario en minutos y en HH:MM (con Total_min y fila TOTAL_GENERAL).
+    None si no hay minutos en la ventana horaria."""
+    # OJO: usamos prev_any calculado sobre TODO el set
+    origen = analisis["cubo_horas"] if params.overlap else analisis["cubo"]
+    _, cuenta = cube_masks(origen, start_date, end_date, params.gestores, params.min_interval)
+    tmp = origen[cuenta]
+    tmp = tmp[(tmp["hora"] >= params.start_h) & (tmp["hora"] < params.end_h)]
+    if tmp.empty:
+        return None
+    agg = tmp.groupby(["Gestor", "hora"], as_index=False, observed=True)["minutos"].sum()
+    agg["col_etiqueta"] = [f"{h:02d}a{(h+1):02d}" for h in agg["hora"]]
+
+    all_cols = [f"{h:02d}a{(h+1):02d}" for h in range(params.start_h, params.end_h)]
+    matriz = pd.pivot_table(agg, index="Gestor", columns="col_etiqueta",
+                            values="minutos", aggfunc="sum", fill_value=0.0, observed=True).astype(float).copy()
+    for c in all_cols:
+        if c not in matriz.columns: matriz[c] = 0.0
+    matriz = matriz[all_cols].sort_index()
+    matriz["Total_min"] = matriz.sum(axis=1)
+    total_row = pd.DataFrame(matriz.sum(axis=0)).T; total_row.index = ["TOTAL_GENERAL"]
+    matriz = pd.concat([matriz, total_row])
+
+    matriz_hhmm = matriz.copy()
+    for c in all_cols + ["Total_min"]:
+        matriz_hhmm[c] = fmt_hhmm_vec(matriz_hhmm[c])
+    return matriz, matriz_hhmm
+
+def style_matrix(matriz: pd.DataFrame, umbral_rojo: float):
+    """Styler de la matriz: HH:MM, degradado por celda, rojo sobre `umbral_rojo` y TOTAL_GENERAL en negrita."""
+    all_cols = [c for c in matriz.columns if c != "Total_min"]
+
+    def highlight_threshold(v):
+        try: val = float(v)
+        except Exception: val = 0.0
+        return "background-color:#ffe5e5; color:#b00000; font-weight:bold;" if val > umbral_rojo else ""
+
+    return (matriz.style
+            .format({c: fmt_hhmm_from_minutes for c in all_cols + ["Total_min"]})
+            .background_gradient(axis=None, cmap="Blues", subset=all_cols)
+            .applymap(highlight_threshold, subset=all_cols)
+            .set_properties(**{"text-align": "center", "font-family": "monospace"})
+            .set_table_styles([
+                {"selector": "th.col_heading", "props": [("text-align", "center")]},
+                {"selector": "th.row_heading", "props": [("text-align", "left")]},
+                {"selector": "thead th", "props": [("background-color", "#f6f8fa")]}
+            ])
+            .set_properties(subset=pd.IndexSlice[["TOTAL_GENERAL"], :], **{"font-weight": "bold"}))
+
+def detail_rows(filas: pd.DataFrame, start_date: date, end_date: date, gestores, min_interval: int) -> pd.DataFrame:
+    """Filas NC/IN cuyo intervalo desde la gestión previa (dentro del rango) cumple el umbral."""
+    sel = ((filas["datetime"] >= pd.Timestamp(start_date)) &
+           (filas["datetime"] < pd.Timestamp(end_date) + pd.Timedelta(days=1)) &
+           (filas["prev_any"] >= pd.Timestamp(start_date)) &
+           (filas["minutos_netos"] >= float(min_interval)))
+    if gestores:
+        sel &= filas["Gestor"].isin(gestores)
+    df_sin = filas[sel].copy()
+    df_sin["minutos_sin_gestion"] = df_sin["minutos_netos"]
+    df_sin["intervalo_hhmm"] = fmt_hhmm_vec(df_sin["minutos_sin_gestion"])
+    df_sin["hhmm"] = df_sin["intervalo_hhmm"]
+    return df_sin
+
+ORDENES_DETALLE = {
+    "Gestor y fecha": (["Gestor", "datetime"], [True, True]),
+    "Más minutos primero": (["minutos_sin_gestion", "Gestor", "datetime"], [False, True, True]),
+    "Más recientes primero": (["datetime", "Gestor"], [False, True]),
+}
+
+def detail_sort_orders(df_sin: pd.DataFrame) -> dict[str, np.ndarray]:
+    """Permutación de filas de `df_sin` para cada orden de `ORDENES_DETALLE` (se calculan una vez;
+    filtrar y paginar después no vuelve a ordenar)."""
+    base = df_sin.reset_index(drop=True)
+    return {name: base.sort_values(cols, ascending=asc, kind="stable").index.to_numpy()
+            for name, (cols, asc) in ORDENES_DETALLE.items()}
+
+def detail_mask(df_sin: pd.DataFrame, gestor_query: str = "", desde: date | None = None,
+                hasta: date | None = None, min_minutos: float | None = None) -> np.ndarray:
+    """Filas de `df_sin` que cumplen la búsqueda: Gestor que contiene el texto (sin distinguir
+    mayúsculas), fecha dentro de [desde, hasta] y minutos mínimos."""
+    mask = np.ones(len(df_sin), dtype=bool)
+    query = gestor_query.strip()
+    if query:
+        gestor = df_sin["Gestor"].astype("category")
+        hits = gestor.cat.categories.astype(str).str.contains(query, case=False, regex=False)
+        codes = gestor.cat.codes.to_numpy()
+        mask &= (codes >= 0) & np.append(hits, False)[codes]
+    if desde is not None:
+        mask &= (df_sin["datetime"] >= pd.Timestamp(desde)).to_numpy()
+    if hasta is not None:
+        mask &= (df_sin["datetime"] < pd.Timestamp(hasta) + pd.Timedelta(days=1)).to_numpy()
+    if min_minutos is not None:
+        mask &= (df_sin["minutos_sin_gestion"] >= float(min_minutos)).to_numpy()
+    return mask
+
+def paginate(order: np.ndarray, mask: np.ndarray, page: int, page_size: int) -> tuple[np.ndarray, int]:
+    """Posiciones de la página `page` (desde 1) dentro del orden precalculado, y total de filas filtradas."""
+    selected = order[mask[order]]
+    lo = (max(page, 1) - 1) * page_size
+    return selected[lo:lo + page_size], len(selected)
+
+def aggregate(ingesta: dict[str, pd.DataFrame], analisis: dict[str, pd.DataFrame],
+              params: AnalysisParams) -> dict[str, pd.DataFrame]:
+    """Resumen por Gestor y matriz horaria para el rango de `params` (todo el export si no se indica)."""
+    min_date, max_date = date_bounds(ingesta["presencia"])
+    start_date, end_date = params.start_date or min_date, params.end_date or max_date
+    en_rango, cuenta = cube_masks(analisis["cubo"], start_date, end_date, params.gestores, params.min_interval)
+    out = {"resumen_gestor": gestor_summary(analisis["cubo"], en_rango, cuenta)}
+    matriz = hour_matrix(analisis, params, start_date, end_date)
+    if matriz is not None:
+        out["matriz"], out["matriz_hhmm"] = matriz
+    return out
+
+def matrix_frame(matriz: pd.DataFrame) -> pd.DataFrame:
+    """Matriz con el Gestor (y TOTAL_GENERAL) como columna, lista para exportar."""
+    return matriz.rename_axis("Gestor").reset_index()
+
+def write_matrix_excel(target, matriz: pd.DataFrame, matriz_hhmm: pd.DataFrame,
+                       resumen_gestor: pd.DataFrame | None = None):
+    """Libro Excel con la matriz en minutos y en HH:MM (y el resumen por Gestor si se pasa)."""
+    sheets = {} if resumen_gestor is None else {"Resumen_gestor": resumen_gestor}
+    sheets.update(Matriz_minutos=matrix_frame(matriz), Matriz_hhmm=matrix_frame(matriz_hhmm))
+    write_xlsx_streaming(sheets, target)
+
+def export_results(results: dict[str, pd.DataFrame], out_dir: str, stem: str,
+                   formats=FORMATOS_SALIDA) -> list[str]:
+    """Escribe el resumen y la matriz en `out_dir` (Parquet por tabla y/o un libro Excel)."""
+    os.makedirs(out_dir, exist_ok=True)
+    written = []
+    if "parquet" in formats:
+        for name, df in results.items():
+            path = os.path.join(out_dir, f"{stem}.{name}.parquet")
+            df = matrix_frame(df) if name.startswith("matriz") else df
+            write_parquet_chunked(df.astype({"Gestor": str}), path)
+            written.append(path)
+    if "xlsx" in formats:
+        path = os.path.join(out_dir, f"{stem}.xlsx")
+        if "matriz" in results:
+            write_matrix_excel(path, results["matriz"], results["matriz_hhmm"], results["resumen_gestor"])
+        else:
+            write_xlsx_streaming({"Resumen_gestor": results["resumen_gestor"]}, path)
+        written.append(path)
+    return written
+
+def run_file(path: str, params: AnalysisParams, out_dir: str, formats=FORMATOS_SALIDA,
+             chunked: bool = False, fmt_fecha: str | None = None, fmt_hora: str | None = None,
+             stem: str | None = None) -> dict:
+    """Procesa un export completo de punta a punta; pensado para ejecutarse en un proceso del pool.
+    Las salidas se llaman `<stem>.*` (por defecto, el nombre del archivo sin extensión)."""
+    t0 = _time.perf_counter()
+    ingesta = load_export(path, chunked, fmt_fecha, fmt_hora)
+    if ingesta["presencia"].empty:
+        raise ValueError("el archivo no contiene filas con fecha-hora y Gestor válidos")
+    analisis = build_cube(ingesta["nc"], params.work_calendar())
+    results = aggregate(ingesta, analisis, params)
+    stem = stem or os.path.splitext(os.path.basename(path))[0]
+    written = export_results(results, out_dir, stem, formats)
+    reporte = ingesta["reporte"].iloc[0]
+    return {
+        "archivo": path,
+        "filas": int(reporte["filas"]),
+        "filas_excluidas": int(reporte["fecha_hora_invalida"]) + int(reporte["sin_gestor"]),
+        "relectura_completa": bool(reporte["relectura_completa"]),
+        "gestores": len(results["resumen_gestor"]),
+        "minutos_sin_gestion": float(results["resumen_gestor"]["minutos_sin_gestion"].sum()),
+        "segundos": round(_time.perf_counter() - t0, 3),
+        "salidas": written,
+    }
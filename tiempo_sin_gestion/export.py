@@ -0,0 +1,108 @@
+# tiempo_sin_gestion/export.py
+"""Exportación por bloques a Excel (xlsxwriter en modo `constant_memory`), CSV y Parquet.
+
+Ningún formato arma el archivo completo en memoria: se escribe a disco bloque a bloque."""
+import os
+import tempfile
+import zipfile
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import xlsxwriter
+
+EXPORT_CHUNK_ROWS = 100_000
+EXCEL_MAX_ROWS = 1_048_576
+FORMATOS_EXPORT = {"xlsx": "Excel (.xlsx)", "csv": "CSV (.csv)", "parquet": "Parquet (.parquet)"}
+MIME_EXPORT = {
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+    "zip": "application/zip",
+}
+
+def _excel_columns(block: pd.DataFrame) -> list[tuple[str, list]]:
+    """Columnas del bloque como (tipo de celda, valores nativos con NaN/NaT → None)."""
+    cols = []
+    for _, s in block.items():
+        if pd.api.types.is_datetime64_any_dtype(s):
+            kind = "datetime"
+        elif pd.api.types.is_numeric_dtype(s) and not pd.api.types.is_bool_dtype(s):
+            kind = "number"
+        else:
+            kind = "string"
+        vals = s.astype(object).to_numpy(copy=True)
+        vals[pd.isna(s).to_numpy()] = None
+        if kind == "string":
+            vals = [None if v is None else str(v) for v in vals]
+        cols.append((kind, list(vals)))
+    return cols
+
+def write_xlsx_streaming(sheets: dict[str, pd.DataFrame], target, chunk_rows: int = EXPORT_CHUNK_ROWS):
+    """Libro Excel con una hoja por tabla, fila a fila en modo `constant_memory` (xlsxwriter solo retiene
+    la fila en curso). Las tablas que no caben en una hoja siguen en `<hoja>_2`, `<hoja>_3`, …"""
+    wb = xlsxwriter.Workbook(target, {"constant_memory": True, "tmpdir": tempfile.gettempdir()})
+    fmt_fecha = wb.add_format({"num_format": "yyyy-mm-dd hh:mm:ss"})
+    try:
+        per_sheet = EXCEL_MAX_ROWS - 1
+        for name, df in sheets.items():
+            for part, start in enumerate(range(0, max(len(df), 1), per_sheet)):
+                ws = wb.add_worksheet(name[:31] if part == 0 else f"{name[:27]}_{part + 1}")
+                ws.write_row(0, 0, [str(c) for c in df.columns])
+                writers = {"number": ws.write_number, "string": ws.write_string,
+                           "datetime": lambda r, c, v: ws.write_datetime(r, c, v, fmt_fecha)}
+                stop = min(start + per_sheet, len(df))
+                for lo in range(start, stop, chunk_rows):
+                    cols = [(writers[kind], vals) for kind, vals in
+                            _excel_columns(df.iloc[lo:min(lo + chunk_rows, stop)])]
+                    # constant_memory exige escribir fila por fila, en orden
+                    for i in range(len(cols[0][1]) if cols else 0):
+                        r = 1 + lo - start + i
+                        for c, (write, vals) in enumerate(cols):
+                            if vals[i] is not None:
+                                write(r, c, vals[i])
+    finally:
+        wb.close()
+
+def write_csv_chunked(df: pd.DataFrame, target, chunk_rows: int = EXPORT_CHUNK_ROWS):
+    for lo in range(0, max(len(df), 1), chunk_rows):
+        df.iloc[lo:lo + chunk_rows].to_csv(target, mode="w" if lo == 0 else "a", header=lo == 0,
+                                           index=False, encoding="utf-8")
+
+def write_parquet_chunked(df: pd.DataFrame, target, chunk_rows: int = EXPORT_CHUNK_ROWS):
+    """Parquet con un row group por bloque; solo se convierte a Arrow un bloque a la vez."""
+    schema = pa.Schema.from_pandas(df.iloc[:chunk_rows], preserve_index=False)
+    # columnas de texto vacías en el primer bloque: se fijan como texto para los siguientes
+    for i, f in enumerate(schema):
+        if pa.types.is_null(f.type):
+            schema = schema.set(i, f.with_type(pa.string()))
+    with pq.ParquetWriter(target, schema) as writer:
+        for lo in range(0, len(df), chunk_rows):
+            writer.write_table(pa.Table.from_pandas(df.iloc[lo:lo + chunk_rows], schema=schema, preserve_index=False))
+
+_WRITERS = {"csv": write_csv_chunked, "parquet": write_parquet_chunked}
+
+def write_export(sheets: dict[str, pd.DataFrame], fmt: str, out_dir: str | None = None,
+                 stem: str = "export") -> str:
+    """Escribe `sheets` en `fmt` dentro de `out_dir` (temporal si no se indica) y devuelve la ruta.
+    En Excel cada tabla es una hoja; en CSV/Parquet varias tablas van en un .zip con un archivo por tabla."""
+    if fmt not in FORMATOS_EXPORT:
+        raise ValueError(f"formato de exportación desconocido: {fmt}")
+    out_dir = out_dir or tempfile.mkdtemp(prefix="tsg-export-")
+    os.makedirs(out_dir, exist_ok=True)
+    if fmt == "xlsx":
+        path = os.path.join(out_dir, f"{stem}.xlsx")
+        write_xlsx_streaming(sheets, path)
+        return path
+    if len(sheets) == 1:
+        path = os.path.join(out_dir, f"{stem}.{fmt}")
+        _WRITERS[fmt](next(iter(sheets.values())), path)
+        return path
+    path = os.path.join(out_dir, f"{stem}.zip")
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name, df in sheets.items():
+            member = os.path.join(out_dir, f"{name}.{fmt}")
+            _WRITERS[fmt](df, member)
+            zf.write(member, arcname=f"{name}.{fmt}")
+            os.remove(member)
+    return path
@@ -0,0 +1,252 @@
+# tiempo_sin_gestion/ingest.py
+"""Lectura del export CSV: parseo de fecha/hora, normalización y gestión previa real por Gestor."""
+import hashlib
+import io
+import os
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from .cache import IngestCache
+from .perf import stage
+
+REQUIRED_COLS = ["FchCreacion", "HraCreacion", "Gestor", "GstCodigo"]
+READ_CSV_OPTS = {"encoding": "latin1", "on_bad_lines": "skip", "usecols": REQUIRED_COLS, "dtype": str}
+CODIGOS_PERMITIDOS = {"nocontacto", "inubicado"}
+INGEST_CHUNK_ROWS = 250_000
+
+FORMATO_AUTO = "Automático"
+FORMATOS_FECHA = ["%d/%m/%Y", "%Y-%m-%d", "%m/%d/%Y", "%d-%m-%Y", "%Y/%m/%d", "%d/%m/%y"]
+FORMATOS_HORA = ["%H:%M:%S", "%H:%M", "%H:%M:%S.%f", "%I:%M:%S %p", "%I:%M %p"]
+MAX_EJEMPLOS_RECHAZO = 20
+MUESTRA_FORMATO = 2000
+
+def detect_format(values: pd.Series, candidates: list[str], sample_size: int = MUESTRA_FORMATO) -> str | None:
+    """Elige el formato que interpreta más valores distintos de una muestra (en empate gana el primero);
+    None si ninguno sirve."""
+    sample = pd.Series(values.dropna().astype(str).str.strip().unique()[:sample_size])
+    best, best_ok = None, 0
+    for fmt in candidates:
+        ok = int(pd.to_datetime(sample, format=fmt, errors="coerce").notna().sum())
+        if ok > best_ok:
+            best, best_ok = fmt, ok
+    return best
+
+def _parse_repeated(values: pd.Series, fmt: str | None) -> pd.Series:
+    """Parsea cada valor distinto una sola vez y lo reparte por código (fechas y horas se repiten mucho)."""
+    codes, uniques = pd.factorize(values.astype("string").str.strip())
+    parsed = pd.to_datetime(pd.Series(uniques, dtype=object), format=fmt or "mixed", errors="coerce")
+    # NaT al final: el código -1 (valor vacío) lo toma, también si la columna no tiene ningún valor
+    parsed = np.append(parsed.to_numpy(dtype="datetime64[ns]"), np.datetime64("NaT", "ns"))
+    return pd.Series(parsed[codes], index=values.index, dtype="datetime64[ns]")
+
+def resolve_formats(df_raw: pd.DataFrame, fmt_fecha: str | None, fmt_hora: str | None) -> tuple[str | None, str | None]:
+    """Formatos explícitos tal cual; los no indicados se detectan una vez sobre los valores del export."""
+    if fmt_fecha is None:
+        fmt_fecha = detect_format(df_raw["FchCreacion"], FORMATOS_FECHA)
+    if fmt_hora is None:
+        fmt_hora = detect_format(df_raw["HraCreacion"], FORMATOS_HORA)
+    return fmt_fecha, fmt_hora
+
+def resolve_formats_chunked(source, fmt_fecha: str | None, fmt_hora: str | None,
+                            chunksize: int = INGEST_CHUNK_ROWS) -> tuple[str | None, str | None]:
+    """Como `resolve_formats` sobre el archivo completo, leyendo por bloques solo las columnas a detectar.
+    Junta los mismos valores distintos (en orden de aparición) que vería la carga completa y se detiene
+    en cuanto tiene la muestra, así que ambos modos eligen el mismo formato."""
+    columnas = {"FchCreacion": (fmt_fecha, FORMATOS_FECHA), "HraCreacion": (fmt_hora, FORMATOS_HORA)}
+    faltan = [c for c, (fmt, _) in columnas.items() if fmt is None]
+    if not faltan:
+        return fmt_fecha, fmt_hora
+    vistos = {c: {} for c in faltan}
+    for chunk in pd.read_csv(_reopen(source), chunksize=chunksize, **{**READ_CSV_OPTS, "usecols": faltan}):
+        for c in faltan:
+            if len(vistos[c]) < MUESTRA_FORMATO:
+                vistos[c].update(dict.fromkeys(chunk[c].dropna().astype(str).str.strip().unique()))
+        if all(len(v) >= MUESTRA_FORMATO for v in vistos.values()):
+            break
+    detectado = {c: detect_format(pd.Series(list(vistos[c]), dtype=object), columnas[c][1]) for c in faltan}
+    return detectado.get("FchCreacion", fmt_fecha), detectado.get("HraCreacion", fmt_hora)
+
+def parse_datetime(df_raw: pd.DataFrame, fmt_fecha: str | None, fmt_hora: str | None) -> pd.Series:
+    """FchCreacion + HraCreacion con formato explícito (None = inferencia por valor distinto)."""
+    fecha = _parse_repeated(df_raw["FchCreacion"], fmt_fecha).dt.normalize()
+    hora = _parse_repeated(df_raw["HraCreacion"], fmt_hora)
+    return fecha + (hora - hora.dt.normalize())
+
+def empty_report(fmt_fecha, fmt_hora) -> dict:
+    # relectura_completa: la carga por bloques tuvo que leer el archivo entero (export no cronológico)
+    return {"filas": 0, "fecha_hora_invalida": 0, "sin_gestor": 0,
+            "formato_fecha": fmt_fecha or "", "formato_hora": fmt_hora or "", "relectura_completa": False,
+            "rechazos": []}
+
+def normalize_rows(df_raw: pd.DataFrame, fmt_fecha: str | None, fmt_hora: str | None,
+                    report: dict) -> pd.DataFrame:
+    """Parsea fecha-hora y normaliza Gestor/GstCodigo; descarta filas sin fecha-hora o sin Gestor
+    y las contabiliza en `report`."""
+    dt = parse_datetime(df_raw, fmt_fecha, fmt_hora)
+    invalid = dt.isna()
+    sin_gestor = df_raw["Gestor"].isna()
+    report["filas"] += len(df_raw)
+    report["fecha_hora_invalida"] += int(invalid.sum())
+    report["sin_gestor"] += int((sin_gestor & ~invalid).sum())
+    falta = MAX_EJEMPLOS_RECHAZO - len(report["rechazos"])
+    if falta > 0 and invalid.any():
+        report["rechazos"].append(df_raw.loc[invalid, REQUIRED_COLS].head(falta))
+    keep = ~invalid & ~sin_gestor
+    df_raw = df_raw[keep]
+    return pd.DataFrame({
+        "Gestor": df_raw["Gestor"].astype(str).str.strip(),
+        "datetime": dt[keep],
+        "GstCodigo": df_raw["GstCodigo"],
+        "es_nc": df_raw["GstCodigo"].astype(str).str.strip().str.lower().isin(CODIGOS_PERMITIDOS),
+    })
+
+def shift_with_carry(df: pd.DataFrame, last: pd.Series) -> tuple[pd.DataFrame, pd.Series]:
+    """Ordena `df` por Gestor y fecha-hora y calcula `prev_any` (gestión previa real, cualquier código).
+    La primera fila de cada Gestor toma su última gestión en `last` (de bloques, días o lecturas anteriores;
+    Series indexada por Gestor). Devuelve también `last` actualizado con la última gestión de cada Gestor."""
+    df = df.sort_values(["Gestor", "datetime"], kind="stable")
+    by_gestor = df.groupby("Gestor", sort=False)["datetime"]
+    df["prev_any"] = by_gestor.shift(1)
+    is_first = ~df["Gestor"].duplicated()
+    df.loc[is_first, "prev_any"] = df.loc[is_first, "Gestor"].map(last)
+    last = pd.concat([last, by_gestor.max()]).groupby(level=0).max()
+    return df, last
+
+def _report_frames(report: dict) -> dict[str, pd.DataFrame]:
+    resumen = pd.DataFrame([{k: v for k, v in report.items() if k != "rechazos"}])
+    rechazos = (pd.concat(report["rechazos"], ignore_index=True).head(MAX_EJEMPLOS_RECHAZO)
+                if report["rechazos"] else pd.DataFrame(columns=REQUIRED_COLS, dtype=str))
+    return {"reporte": resumen, "rechazos": rechazos}
+
+def empty_report_frames() -> dict[str, pd.DataFrame]:
+    return _report_frames(empty_report(None, None))
+
+def _split_prepared(df: pd.DataFrame) -> dict[str, pd.DataFrame]:
+    """Ingesta compacta: filas NoContacto/Inubicado con su `prev_any` + presencia (Gestor, fecha) de todas las filas."""
+    nc = df.loc[df["es_nc"], ["Gestor", "datetime", "GstCodigo", "prev_any"]]
+    presencia = pd.DataFrame({"Gestor": df["Gestor"], "fecha": df["datetime"].dt.normalize()}).drop_duplicates()
+    return {"nc": nc, "presencia": presencia}
+
+def _as_category(parts: list[pd.Series], sort: bool = False) -> pd.Categorical:
+    cat = union_categoricals([p.astype("category") for p in parts], ignore_order=True)
+    return cat.reorder_categories(sorted(cat.categories)) if sort else cat
+
+def _finalize(nc_parts: list[pd.DataFrame], pres_parts: list[pd.DataFrame], report: dict) -> dict[str, pd.DataFrame]:
+    nc = pd.DataFrame({
+        "Gestor": _as_category([p["Gestor"] for p in nc_parts], sort=True),
+        "datetime": pd.concat([p["datetime"] for p in nc_parts], ignore_index=True),
+        "GstCodigo": _as_category([p["GstCodigo"] for p in nc_parts]),
+        "prev_any": pd.concat([p["prev_any"] for p in nc_parts], ignore_index=True),
+    })
+    nc = nc.sort_values(["Gestor", "datetime"], kind="stable").reset_index(drop=True)
+    presencia = pd.concat(pres_parts, ignore_index=True).drop_duplicates(ignore_index=True)
+    presencia["Gestor"] = presencia["Gestor"].astype("category")
+    return {"nc": nc, "presencia": presencia, **_report_frames(report)}
+
+def prepare_frame(df_raw: pd.DataFrame, fmt_fecha: str | None = None, fmt_hora: str | None = None) -> dict[str, pd.DataFrame]:
+    """Parsea, normaliza y calcula la gestión previa real (`prev_any`, cualquier código) por Gestor.
+    Los formatos no indicados se detectan sobre el propio export."""
+    with stage("parseo_fecha_hora", len(df_raw)) as etapa:
+        fmt_fecha, fmt_hora = resolve_formats(df_raw, fmt_fecha, fmt_hora)
+        report = empty_report(fmt_fecha, fmt_hora)
+        df = normalize_rows(df_raw, fmt_fecha, fmt_hora, report)
+        etapa.filas_salida = len(df)
+    with stage("orden_shift", len(df)) as etapa:
+        df, _ = shift_with_carry(df, pd.Series(dtype="datetime64[ns]"))
+        prepared = _split_prepared(df)
+        out = _finalize([prepared["nc"]], [prepared["presencia"]], report)
+        etapa.filas_salida = len(out["nc"])
+    return out
+
+class _OutOfOrder(Exception):
+    pass
+
+def _reopen(source):
+    """Ruta tal cual, o un buffer nuevo sobre los mismos bytes (pandas cierra el que recibe al leer por bloques)."""
+    return source if isinstance(source, (str, os.PathLike)) else io.BytesIO(source.getvalue())
+
+def prepare_frame_chunked(source, chunksize: int = INGEST_CHUNK_ROWS,
+                          fmt_fecha: str | None = None, fmt_hora: str | None = None) -> dict[str, pd.DataFrame]:
+    """Como `prepare_frame`, pero leyendo el CSV por bloques. Solo se arrastra entre bloques la última
+    gestión de cada Gestor, y de cada bloque se conservan solo las filas NC/IN, así que el pico de memoria
+    depende del tamaño de bloque y del número de gestores, no del total de filas del archivo.
+
+    Exige que, por Gestor, las filas de un bloque no sean anteriores a las de bloques previos (exports
+    cronológicos); si no, se relee el archivo completo con `prepare_frame` para dar el mismo resultado, sin
+    el límite de memoria, y el reporte lo indica en `relectura_completa`."""
+    last = pd.Series(dtype="datetime64[ns]")
+    nc_parts, pres_parts = [], []
+    # los formatos se detectan sobre todo el archivo (no sobre el primer bloque) y los comparten los bloques
+    with stage("deteccion_formato"):
+        fmt_fecha, fmt_hora = resolve_formats_chunked(source, fmt_fecha, fmt_hora, chunksize)
+    report = None
+    try:
+        for chunk in pd.read_csv(_reopen(source), chunksize=chunksize, **READ_CSV_OPTS):
+            if report is None:
+                report = empty_report(fmt_fecha, fmt_hora)
+            df = normalize_rows(chunk, fmt_fecha, fmt_hora, report)
+            df, last = shift_with_carry(df, last)
+            # dentro del bloque las filas quedan ordenadas: solo la primera de un Gestor puede ir hacia atrás
+            if (df["prev_any"] > df["datetime"]).any():
+                raise _OutOfOrder()
+
+            prepared = _split_prepared(df)
+            nc_parts.append(prepared["nc"].astype({"Gestor": "category", "GstCodigo": "category"}))
+            pres_parts.append(prepared["presencia"])
+    except _OutOfOrder:
+        with stage("relectura_completa"):
+            out = prepare_frame(pd.read_csv(_reopen(source), **READ_CSV_OPTS), fmt_fecha, fmt_hora)
+        out["reporte"] = out["reporte"].assign(relectura_completa=True)
+        return out
+    if report is None:
+        return prepare_frame(pd.DataFrame(columns=REQUIRED_COLS, dtype=str), fmt_fecha, fmt_hora)
+    return _finalize(nc_parts, pres_parts, report)
+
+def check_columns(source):
+    """Lanza KeyError con la primera columna obligatoria que falte en la cabecera del CSV."""
+    header = pd.read_csv(_reopen(source), nrows=0, encoding=READ_CSV_OPTS["encoding"])
+    for col in REQUIRED_COLS:
+        if col not in header.columns:
+            raise KeyError(col)
+    if not isinstance(source, (str, os.PathLike)):
+        source.seek(0)
+
+def read_rows(source, fmt_fecha: str | None = None, fmt_hora: str | None = None) -> tuple[pd.DataFrame, dict[str, pd.DataFrame]]:
+    """Todas las filas válidas del CSV, normalizadas (sin `prev_any`), más el reporte de parseo."""
+    check_columns(source)
+    df_raw = pd.read_csv(_reopen(source), **READ_CSV_OPTS)
+    fmt_fecha, fmt_hora = resolve_formats(df_raw, fmt_fecha, fmt_hora)
+    report = empty_report(fmt_fecha, fmt_hora)
+    rows = normalize_rows(df_raw, fmt_fecha, fmt_hora, report)
+    return rows, _report_frames(report)
+
+def load_export(source, chunked: bool = False,
+                fmt_fecha: str | None = None, fmt_hora: str | None = None) -> dict[str, pd.DataFrame]:
+    """Ingesta preparada de un export (ruta o buffer), sin caché."""
+    check_columns(source)
+    if chunked:
+        with stage("lectura_por_bloques") as etapa:
+            out = prepare_frame_chunked(source, fmt_fecha=fmt_fecha, fmt_hora=fmt_hora)
+            etapa.filas_salida = len(out["nc"])
+        return out
+    with stage("lectura_csv") as etapa:
+        df_raw = pd.read_csv(_reopen(source), **READ_CSV_OPTS)
+        etapa.filas_salida = len(df_raw)
+    return prepare_frame(df_raw, fmt_fecha, fmt_hora)
+
+def content_digest(data: bytes) -> str:
+    """sha256 del contenido de un export."""
+    return hashlib.sha256(data).hexdigest()
+
+def ingest_key(digest: str, fmt_fecha: str | None = None, fmt_hora: str | None = None) -> str:
+    """Clave de caché de la ingesta: hash de contenido + opciones de lectura/parseo."""
+    opts = repr((sorted(READ_CSV_OPTS.items()), fmt_fecha, fmt_hora))
+    return hashlib.sha256(f"{digest}|{opts}".encode()).hexdigest()[:32]
+
+def load_prepared(source, key: str, cache: IngestCache, chunked: bool = False,
+                  fmt_fecha: str | None = None, fmt_hora: str | None = None) -> dict[str, pd.DataFrame]:
+    """Ingesta preparada del CSV subido, cacheada bajo `key` (ver `ingest_key`).
+    Ambos modos (completo / por bloques) dan el mismo resultado, así que comparten entrada de caché."""
+    return cache.get(key, lambda: load_export(source, chunked, fmt_fecha, fmt_hora))
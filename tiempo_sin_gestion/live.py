@@ -0,0 +1,228 @@
+# tiempo_sin_gestion/live.py
+"""Monitoreo intradía: sigue una carpeta de exports (o un CSV que crece) e ingiere solo las filas nuevas.
+
+Entre lecturas solo se arrastra la última gestión de cada Gestor y los cubos agregados; cada lectura
+procesa las filas nuevas y suma su cubo al acumulado, así que su costo depende de las filas nuevas
+(y del tamaño del cubo, acotado por gestores × horas), no del total del día."""
+from dataclasses import dataclass, field, replace
+from datetime import datetime
+import glob
+import hashlib
+import io
+import os
+import threading
+
+import pandas as pd
+
+from .cube import CUBO_DIMS, build_cube
+from .ingest import READ_CSV_OPTS, REQUIRED_COLS, empty_report, normalize_rows, resolve_formats, shift_with_carry
+from .perf import stage
+from .schedule import WorkCalendar
+
+# bytes finales ya leídos que se comparan en cada lectura para detectar una reescritura en el mismo archivo
+_COLA_BYTES = 4096
+
+@dataclass
+class _Tail:
+    offset: int = 0
+    header: list[str] | None = None
+    inode: int | None = None
+    # hash de los bytes ya leídos (para reconocer un reemplazo que solo agrega filas) y sus últimos bytes
+    digest: "hashlib._Hash" = field(default_factory=hashlib.sha256)
+    cola: bytes = b""
+
+def _read_range(path: str, start: int, size: int) -> bytes:
+    with open(path, "rb") as f:
+        f.seek(start)
+        return f.read(size)
+
+def _empty_cube(cols: list[str]) -> pd.DataFrame:
+    return pd.DataFrame({"Gestor": pd.Categorical([]), "fecha": pd.Series(dtype="datetime64[ns]"),
+                         "fecha_prev": pd.Series(dtype="datetime64[ns]"), "hora": pd.Series(dtype="int8"),
+                         "tramo": pd.Series(dtype="int8"), **{c: pd.Series(dtype="float64") for c in cols}})
+
+def _merge_cube(acc: pd.DataFrame | None, new: pd.DataFrame, cols: list[str]) -> pd.DataFrame:
+    """Suma el cubo de las filas nuevas al acumulado (Gestor como categoría ordenada)."""
+    if acc is None or acc.empty:
+        out = new
+    else:
+        both = pd.concat([acc.astype({"Gestor": str}), new.astype({"Gestor": str})], ignore_index=True)
+        out = both.groupby(CUBO_DIMS, observed=True, dropna=False, as_index=False)[cols].sum()
+    out = out.astype({"Gestor": str})
+    out["Gestor"] = pd.Categorical(out["Gestor"], categories=sorted(out["Gestor"].unique()))
+    return out
+
+class LiveMonitor:
+    """Ingesta incremental de `path` (carpeta con *.csv o un archivo CSV).
+
+    Cada archivo se lee desde el último byte procesado y solo hasta la última línea completa. Se asume que,
+    por Gestor, las filas llegan en orden cronológico: una fila anterior a la última gestión ya vista cuenta
+    como intento pero no corrige el intervalo ya contabilizado (se informa en `fuera_de_orden`).
+
+    Si un archivo se trunca o se reemplaza por otro que no empieza con lo ya leído, los acumulados se
+    reconstruyen desde cero con todos los archivos (`relecturas`); un reemplazo atómico que solo agrega filas
+    sigue leyéndose desde donde iba."""
+
+    def __init__(self, path: str, calendario: WorkCalendar, fmt_fecha: str | None = None,
+                 fmt_hora: str | None = None):
+        self.path = path
+        self.calendario = calendario
+        self._formatos = (fmt_fecha, fmt_hora)
+        self.version = 0
+        self.relecturas = 0
+        self.ultima_lectura: datetime | None = None
+        self.filas_nuevas = 0
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        """Vacía los acumulados y las posiciones de lectura (la versión sigue creciendo)."""
+        self.fmt_fecha, self.fmt_hora = self._formatos
+        self.report = empty_report(self.fmt_fecha, self.fmt_hora)
+        self.fuera_de_orden = 0
+        self._tails: dict[str, _Tail] = {}
+        self._last = pd.Series(dtype="datetime64[ns]")
+        self._cubo: pd.DataFrame | None = None
+        self._cubo_horas: pd.DataFrame | None = None
+        self._fechas: tuple[pd.Timestamp, pd.Timestamp] | None = None
+
+    def files(self) -> list[str]:
+        if os.path.isdir(self.path):
+            files = glob.glob(os.path.join(self.path, "*.csv"))
+            return sorted(files, key=lambda f: (os.path.getmtime(f), f))
+        return [self.path] if os.path.exists(self.path) else []
+
+    def _rewritten(self, path: str) -> bool:
+        """True si lo ya leído de `path` dejó de ser el inicio del archivo (truncado o reemplazado)."""
+        tail = self._tails.get(path)
+        if tail is None:
+            return False
+        st = os.stat(path)
+        if st.st_size < tail.offset:
+            return True
+        if st.st_ino == tail.inode:
+            return _read_range(path, tail.offset - len(tail.cola), len(tail.cola)) != tail.cola
+        # otro archivo con el mismo nombre: sirve solo si empieza exactamente con lo ya leído
+        prefijo, falta = hashlib.sha256(), tail.offset
+        with open(path, "rb") as f:
+            while falta and (bloque := f.read(min(falta, 1 << 20))):
+                prefijo.update(bloque)
+                falta -= len(bloque)
+        if prefijo.digest() != tail.digest.digest():
+            return True
+        tail.inode = st.st_ino
+        return False
+
+    def _read_new(self, path: str) -> tuple[_Tail, pd.DataFrame | None]:
+        """Filas completas añadidas a `path` desde la lectura anterior (None si no hay) y la posición de
+        lectura que queda tras ellas; `self._tails` no se toca hasta que `poll` procesa las filas."""
+        st = os.stat(path)
+        anterior = self._tails.get(path) or _Tail()
+        tail = replace(anterior, inode=st.st_ino, digest=anterior.digest.copy())
+        if st.st_size == tail.offset:
+            return tail, None
+        data = _read_range(path, tail.offset, st.st_size - tail.offset)
+        cut = data.rfind(b"\n")
+        if cut < 0:
+            return tail, None
+        data = data[:cut + 1]
+        if tail.header is None:
+            header = pd.read_csv(io.BytesIO(data), nrows=0, encoding=READ_CSV_OPTS["encoding"]).columns
+            for col in REQUIRED_COLS:
+                if col not in header:
+                    raise KeyError(col)
+            tail.header = list(header)
+            df = pd.read_csv(io.BytesIO(data), **READ_CSV_OPTS)
+        else:
+            df = pd.read_csv(io.BytesIO(data), header=None, names=tail.header, **READ_CSV_OPTS)
+        tail.offset += len(data)
+        tail.digest.update(data)
+        tail.cola = (tail.cola + data)[-_COLA_BYTES:]
+        return tail, df
+
+    def poll(self) -> int:
+        """Lee lo nuevo de todos los archivos y actualiza los acumulados; devuelve cuántas filas se leyeron.
+
+        Todo se calcula aparte y se confirma al final: si algo falla, las posiciones de lectura y los
+        acumulados quedan como estaban y la próxima lectura vuelve a intentar las mismas filas."""
+        with self._lock, stage("monitoreo") as etapa:
+            with stage("lectura_nueva"):
+                archivos = self.files()
+                if any(self._rewritten(f) for f in archivos):
+                    # las filas ya sumadas no se pueden descontar por archivo (los intervalos encadenan
+                    # gestiones de distintos archivos): se reconstruye todo con el contenido actual
+                    self._reset()
+                    self.relecturas += 1
+                tails, partes = {}, []
+                for f in archivos:
+                    tails[f], df = self._read_new(f)
+                    if df is not None and not df.empty:
+                        partes.append(df)
+            filas_nuevas = sum(len(p) for p in partes)
+            etapa.filas_entrada = filas_nuevas
+            fmt_fecha, fmt_hora, report = self.fmt_fecha, self.fmt_hora, self.report
+            last, fuera_de_orden, fechas_rango = self._last, self.fuera_de_orden, self._fechas
+            cubo, cubo_horas = self._cubo, self._cubo_horas
+
+            if partes:
+                raw = pd.concat(partes, ignore_index=True)
+                report = {**report, "rechazos": list(report["rechazos"])}
+                if fmt_fecha is None or fmt_hora is None:
+                    # los formatos se fijan con la primera lectura para que todas las siguientes los compartan
+                    fmt_fecha, fmt_hora = resolve_formats(raw, fmt_fecha, fmt_hora)
+                    report.update(formato_fecha=fmt_fecha or "", formato_hora=fmt_hora or "")
+
+                with stage("gestion_previa", len(raw)):
+                    df = normalize_rows(raw, fmt_fecha, fmt_hora, report)
+                    df, last = shift_with_carry(df, last)
+                    fuera_de_orden += int((df["prev_any"] > df["datetime"]).sum())
+
+                if not df.empty:
+                    fechas = df["datetime"].dt.normalize()
+                    lo, hi = fechas.min(), fechas.max()
+                    fechas_rango = (lo, hi) if fechas_rango is None else (min(fechas_rango[0], lo),
+                                                                         max(fechas_rango[1], hi))
+                nc = df.loc[df["es_nc"], ["Gestor", "datetime", "GstCodigo", "prev_any"]]
+                if not nc.empty:
+                    nuevo = build_cube(nc.astype({"Gestor": "category", "GstCodigo": "category"}), self.calendario)
+                    with stage("acumulado", len(nuevo["cubo"])) as acumulado:
+                        cubo = _merge_cube(cubo, nuevo["cubo"], ["n", "minutos"])
+                        cubo_horas = _merge_cube(cubo_horas, nuevo["cubo_horas"], ["minutos"])
+                        acumulado.filas_salida = len(cubo)
+
+            self._tails.update(tails)
+            self.fmt_fecha, self.fmt_hora, self.report = fmt_fecha, fmt_hora, report
+            self._last, self.fuera_de_orden, self._fechas = last, fuera_de_orden, fechas_rango
+            self._cubo, self._cubo_horas = cubo, cubo_horas
+            self.ultima_lectura = datetime.now()
+            self.filas_nuevas = filas_nuevas
+            if partes:
+                self.version += 1
+            return filas_nuevas
+
+    def snapshot(self) -> dict:
+        """Estado actual (los DataFrames se reemplazan en cada lectura, nunca se modifican: no mutarlos)."""
+        with self._lock:
+            return {
+                "version": self.version,
+                "cubo": self._cubo if self._cubo is not None else _empty_cube(["n", "minutos"]),
+                "cubo_horas": self._cubo_horas if self._cubo_horas is not None else _empty_cube(["minutos"]),
+                "ultima_gestion": self._last.copy(),
+                "fechas": self._fechas,
+                "archivos": len(self._tails),
+                "filas": self.report["filas"],
+                "filas_nuevas": self.filas_nuevas,
+                "fuera_de_orden": self.fuera_de_orden,
+                "relecturas": self.relecturas,
+                "ultima_lectura": self.ultima_lectura,
+            }
+
+    def idle_now(self, now: datetime | None = None) -> pd.DataFrame:
+        """Minutos laborables transcurridos desde la última gestión de cada Gestor hasta `now`."""
+        with self._lock:
+            last = self._last.copy()
+        now = pd.Timestamp(now or datetime.now())
+        mins = self.calendario.net_minutes(last.index.to_numpy(), last.to_numpy(),
+                                           pd.Series(now, index=range(len(last)), dtype="datetime64[ns]"))
+        return (pd.DataFrame({"Gestor": last.index, "ultima_gestion": last.to_numpy(), "minutos_sin_gestion": mins})
+                .sort_values("minutos_sin_gestion", ascending=False, ignore_index=True))
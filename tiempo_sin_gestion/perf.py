@@ -0,0 +1,122 @@
+# tiempo_sin_gestion/perf.py
+"""Instrumentación opcional por etapa: tiempo de reloj, filas de entrada/salida y pico de memoria.
+
+Las funciones del paquete marcan sus etapas con `stage(...)`; solo se mide algo si hay un
+`StageRecorder` activo en el contexto actual (la app lo activa cuando se pide el diagnóstico)."""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass
+import json
+import threading
+import time as _time
+import tracemalloc
+import weakref
+
+import pandas as pd
+
+_ACTIVE: ContextVar["StageRecorder | None"] = ContextVar("tsg_stage_recorder", default=None)
+_tracing_lock = threading.Lock()
+_tracing_users = 0
+
+@dataclass
+class StageRecord:
+    etapa: str
+    nivel: int
+    filas_entrada: int | None = None
+    filas_salida: int | None = None
+    segundos: float = 0.0
+    pico_mb: float | None = None
+
+class _Frame:
+    __slots__ = ("record", "t0", "base", "peak")
+
+def _start_tracing():
+    global _tracing_users
+    with _tracing_lock:
+        if _tracing_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        _tracing_users += 1
+
+def _stop_tracing():
+    global _tracing_users
+    with _tracing_lock:
+        _tracing_users -= 1
+        if _tracing_users == 0 and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+class StageRecorder:
+    """Registro de etapas de una ejecución. Las etapas pueden anidarse; el pico de memoria de cada una
+    es lo asignado por encima de lo que había al entrar (tracemalloc: memoria del proceso vía Python/numpy)."""
+    def __init__(self, track_memory: bool = True):
+        self.track_memory = track_memory
+        self.records: list[StageRecord] = []
+        self._stack: list[_Frame] = []
+        # tracemalloc queda encendido mientras viva algún registro que mida memoria
+        self._release = weakref.finalize(self, _stop_tracing) if track_memory else None
+        if track_memory:
+            _start_tracing()
+
+    def close(self):
+        if self._release is not None:
+            self._release()
+
+    @contextmanager
+    def activate(self):
+        """Hace de este registro el activo para `stage()` mientras dure el bloque."""
+        token = _ACTIVE.set(self)
+        try:
+            yield self
+        finally:
+            _ACTIVE.reset(token)
+            self.close()
+
+    @contextmanager
+    def stage(self, name: str, rows_in: int | None = None):
+        rec = StageRecord(name, len(self._stack), None if rows_in is None else int(rows_in))
+        self.records.append(rec)
+        frame = _Frame()
+        frame.record = rec
+        tracing = self.track_memory and tracemalloc.is_tracing()
+        if tracing:
+            cur, peak = tracemalloc.get_traced_memory()
+            if self._stack:
+                self._stack[-1].peak = max(self._stack[-1].peak, peak)
+            tracemalloc.reset_peak()
+            frame.base = frame.peak = cur
+        self._stack.append(frame)
+        frame.t0 = _time.perf_counter()
+        try:
+            yield rec
+        finally:
+            rec.segundos = round(_time.perf_counter() - frame.t0, 4)
+            self._stack.pop()
+            if tracing:
+                frame.peak = max(frame.peak, tracemalloc.get_traced_memory()[1])
+                rec.pico_mb = round((frame.peak - frame.base) / 2**20, 2)
+                if self._stack:
+                    self._stack[-1].peak = max(self._stack[-1].peak, frame.peak)
+                tracemalloc.reset_peak()
+
+    def frame(self) -> pd.DataFrame:
+        cols = list(StageRecord.__dataclass_fields__)
+        df = pd.DataFrame([asdict(r) for r in self.records], columns=cols)
+        return df.astype({"filas_entrada": "Int64", "filas_salida": "Int64"})
+
+    def to_json(self, contexto: dict | None = None) -> str:
+        return json.dumps({"contexto": contexto or {}, "etapas": [asdict(r) for r in self.records]},
+                          ensure_ascii=False, indent=2, default=str)
+
+def install(recorder: StageRecorder | None):
+    """Activa `recorder` (o ninguno) en el contexto actual sin bloque `with`; pensado para un script de
+    Streamlit, que lo instala al inicio de cada ejecución."""
+    _ACTIVE.set(recorder)
+
+@contextmanager
+def stage(name: str, rows_in: int | None = None):
+    """Marca una etapa en el registro activo; sin registro activo no mide nada."""
+    recorder = _ACTIVE.get()
+    if recorder is None:
+        yield StageRecord(name, 0)
+        return
+    with recorder.stage(name, rows_in) as rec:
+        yield rec
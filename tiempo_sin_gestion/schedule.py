@@ -0,0 +1,301 @@
+# tiempo_sin_gestion/schedule.py
+"""Calendario laboral: descansos diarios, turnos por gestor (o equipo) y feriados.
+
+El calendario se compila a sumas de prefijos de tiempo laborable por perfil (cada combinación distinta
+de turno, descansos y feriados): los minutos netos de un intervalo son `acumulado(fin) - acumulado(inicio)`,
+una búsqueda de costo constante que no depende de cuántos descansos o turnos haya."""
+from collections import defaultdict
+from dataclasses import dataclass, replace
+from datetime import date, datetime, time
+import hashlib
+import io
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+from .calc import _NS_DAY, _NS_MIN, _to_ns, hour_blocks
+
+MIN_DIA = 24 * 60
+TODOS = "*"
+TIPOS_FILA = ("turno", "descanso", "feriado")
+_DIAS = {"lun": 0, "mar": 1, "mie": 2, "jue": 3, "vie": 4, "sab": 5, "dom": 6}
+# 1970-01-01 fue jueves
+_WEEKDAY_EPOCH = 3
+
+Ventana = tuple[str, int, time, time]
+
+def _window_mask(windows) -> np.ndarray:
+    """Minutos del día (0–1439) cubiertos por ventanas diarias (inicio, fin). Como se repiten todos los días,
+    si fin <= inicio la ventana cubre hasta medianoche y desde las 00:00 hasta `fin`."""
+    mask = np.zeros(MIN_DIA, dtype=bool)
+    for ini, fin in windows:
+        a, b = ini.hour * 60 + ini.minute, fin.hour * 60 + fin.minute
+        if b > a:
+            mask[a:b] = True
+        else:
+            mask[a:] = True
+            mask[:b] = True
+    return mask
+
+def _week_masks(windows) -> list[np.ndarray]:
+    """Minutos cubiertos por día de semana por ventanas (día, inicio, fin). Si fin <= inicio la ventana llega
+    hasta medianoche y sigue el día siguiente hasta `fin` (turnos nocturnos; `00:00–00:00` = 24 h)."""
+    semana = [np.zeros(MIN_DIA, dtype=bool) for _ in range(7)]
+    for dia, ini, fin in windows:
+        a, b = ini.hour * 60 + ini.minute, fin.hour * 60 + fin.minute
+        if b > a:
+            semana[dia][a:b] = True
+        else:
+            semana[dia][a:] = True
+            semana[(dia + 1) % 7][:b] = True
+    return semana
+
+class _WorkIndex:
+    """Sumas de prefijos compiladas para un rango de días: por perfil y día, la plantilla horaria que
+    aplica y los minutos laborables acumulados antes de ese día; por plantilla y minuto, los acumulados
+    hasta ese minuto y si el minuto es laborable (empaquetados como `acumulado * 2 + laborable`)."""
+    __slots__ = ("d0", "n_dias", "prof", "tmpl", "acc_day", "minutos")
+
+    def cumulative_ns(self, pos: np.ndarray, t: np.ndarray) -> np.ndarray:
+        """ns laborables desde el inicio del rango hasta `t`, para el perfil de cada posición `pos`."""
+        day, tod = np.divmod(t, _NS_DAY)
+        celda = day - self.d0
+        if self.prof is not None:
+            celda += self.prof.take(pos) * self.n_dias
+        m = tod // _NS_MIN
+        minuto = self.minutos.take(self.tmpl.take(celda) * MIN_DIA + m)
+        return (self.acc_day.take(celda) + (minuto >> 1)) * _NS_MIN + (minuto & 1) * (tod - m * _NS_MIN)
+
+@dataclass(frozen=True)
+class WorkCalendar:
+    """Tiempo laborable por gestor.
+
+    - `breaks`: descansos diarios para todos (refrigerio, pausas);
+    - `turnos`: ventanas laborables (gestor, día 0=Lun…6=Dom, inicio, fin). Un gestor sin filas propias usa
+      las de `*`; si tampoco hay, trabaja las 24 h. Los días sin ventana no son laborables. Si fin <= inicio
+      el turno es nocturno: la parte `[00:00, fin)` cae en el día siguiente;
+    - `descansos`: descansos propios (gestor o `*`), además de `breaks`; cruzan medianoche igual que los turnos;
+    - `feriados`: (gestor o `*`, fecha) sin tiempo laborable en ese día calendario (incluida la parte de
+      madrugada de un turno nocturno que empezó el día anterior).
+
+    La resolución es de un minuto."""
+    breaks: tuple[tuple[time, time], ...] = ()
+    turnos: tuple[Ventana, ...] = ()
+    descansos: tuple[Ventana, ...] = ()
+    feriados: tuple[tuple[str, date], ...] = ()
+
+    def with_breaks(self, breaks) -> "WorkCalendar":
+        return replace(self, breaks=tuple(breaks))
+
+    @property
+    def solo_descansos(self) -> bool:
+        return not (self.turnos or self.descansos or self.feriados)
+
+    def signature(self) -> str:
+        """Identificador corto y estable; con solo descansos coincide con `breaks_signature`."""
+        partes = [(b.isoformat(), e.isoformat()) for b, e in self.breaks]
+        if not self.solo_descansos:
+            partes += [sorted((g, d, i.isoformat(), f.isoformat()) for g, d, i, f in v)
+                       for v in (self.turnos, self.descansos)]
+            partes.append(sorted((g, f.isoformat()) for g, f in self.feriados))
+        return hashlib.sha256(repr(partes).encode()).hexdigest()[:12]
+
+    def resumen(self) -> dict:
+        """Conteos para mostrar en la interfaz / diagnóstico."""
+        return {
+            "descansos": [f"{b:%H:%M}-{e:%H:%M}" for b, e in self.breaks],
+            "gestores_con_turno": len({g for g, *_ in self.turnos} - {TODOS}),
+            "turno_general": any(g == TODOS for g, *_ in self.turnos),
+            "descansos_propios": len(self.descansos),
+            "feriados": len(self.feriados),
+        }
+
+    def _profiles(self, gestores: list[str]) -> tuple[np.ndarray, list[tuple[list[np.ndarray], set[date]]]]:
+        """Perfil de cada gestor y, por perfil, su máscara de minutos laborables por día de semana y sus feriados.
+        Los gestores con la misma configuración comparten perfil (un equipo cuesta lo mismo que un gestor)."""
+        por_gestor = {k: defaultdict(list) for k in ("turnos", "descansos", "feriados")}
+        for g, d, i, f in self.turnos:
+            por_gestor["turnos"][g].append((d, i, f))
+        for g, d, i, f in self.descansos:
+            por_gestor["descansos"][g].append((d, i, f))
+        for g, f in self.feriados:
+            por_gestor["feriados"][g].append(f)
+        generales = _window_mask(self.breaks)
+
+        claves, perfiles = {}, []
+        prof = np.empty(len(gestores), dtype=np.int64)
+        for n, g in enumerate(gestores):
+            turnos = por_gestor["turnos"].get(g) or por_gestor["turnos"].get(TODOS)
+            descansos = por_gestor["descansos"].get(g, []) + por_gestor["descansos"].get(TODOS, [])
+            feriados = frozenset(por_gestor["feriados"].get(g, []) + por_gestor["feriados"].get(TODOS, []))
+            clave = (tuple(sorted(turnos)) if turnos else None, tuple(sorted(descansos)), feriados)
+            if clave not in claves:
+                semana = ([np.ones(MIN_DIA, dtype=bool) for _ in range(7)] if turnos is None
+                          else _week_masks(turnos))
+                for mask, propios in zip(semana, _week_masks(descansos)):
+                    mask &= ~(generales | propios)
+                claves[clave] = len(perfiles)
+                perfiles.append((semana, set(feriados)))
+            prof[n] = claves[clave]
+        return prof, perfiles
+
+    def _index(self, gestor, lo_ns: int, hi_ns: int) -> _WorkIndex:
+        """Compila el calendario para los gestores de `gestor` (uno por fila) y los días de [lo_ns, hi_ns]."""
+        g = pd.Series(gestor)
+        cat = g.array if isinstance(g.dtype, pd.CategoricalDtype) else pd.Categorical(g)
+        codes = np.asarray(cat.codes, dtype=np.int64)
+        # las filas sin gestor usan el perfil general (`*`)
+        nombres = [str(c) for c in cat.categories] + [TODOS]
+        prof_cat, perfiles = self._profiles(nombres)
+        idx = _WorkIndex()
+        # con un único perfil (sin turnos, o todos iguales) no hace falta el perfil por fila
+        idx.prof = prof_cat[np.where(codes >= 0, codes, len(nombres) - 1)] if len(perfiles) > 1 else None
+
+        d0, d1 = lo_ns // _NS_DAY, hi_ns // _NS_DAY
+        idx.d0 = d0
+        dias = np.arange(d0, d1 + 1)
+        weekday = (dias + _WEEKDAY_EPOCH) % 7
+
+        plantillas, ids = [np.zeros(MIN_DIA, dtype=bool)], {}
+        ids[plantillas[0].tobytes()] = 0   # plantilla 0: día sin tiempo laborable (feriado)
+        tmpl = np.empty((len(perfiles), len(dias)), dtype=np.int64)
+        for p, (semana, feriados) in enumerate(perfiles):
+            por_dia = []
+            for mask in semana:
+                k = mask.tobytes()
+                if k not in ids:
+                    ids[k] = len(plantillas)
+                    plantillas.append(mask)
+                por_dia.append(ids[k])
+            tmpl[p] = np.asarray(por_dia)[weekday]
+            if feriados:
+                off = np.array([np.datetime64(f, "D").astype(np.int64) for f in feriados]) - d0
+                tmpl[p, off[(off >= 0) & (off < len(dias))]] = 0
+        work = np.stack(plantillas).astype(np.int64)
+        idx.minutos = ((np.cumsum(work, axis=1) - work) * 2 + work).ravel()
+        por_dia = work.sum(axis=1)[tmpl]
+        idx.acc_day = (np.cumsum(por_dia, axis=1) - por_dia).ravel()
+        idx.tmpl = tmpl.ravel()
+        idx.n_dias = len(dias)
+        return idx
+
+    def net_minutes(self, gestor, start, end) -> np.ndarray:
+        """Minutos laborables de cada intervalo [start, end) según el calendario de su gestor."""
+        start, end = pd.Series(start), pd.Series(end)
+        valid = (start.notna() & end.notna()).to_numpy()
+        out = np.zeros(len(start), dtype=float)
+        s_ns, e_ns = _to_ns(start), _to_ns(end)
+        rows = np.flatnonzero(valid & (e_ns > s_ns))
+        if not len(rows):
+            return out
+        s_ns, e_ns = s_ns[rows], e_ns[rows]
+        idx = self._index(gestor, int(s_ns.min()), int(e_ns.max()))
+        out[rows] = (idx.cumulative_ns(rows, e_ns) - idx.cumulative_ns(rows, s_ns)) / _NS_MIN
+        return out
+
+    def explode_hours(self, gestor, start, end, start_h: int, end_h: int):
+        """Explota los intervalos [start, end) en bloques de 1h dentro de [start_h, end_h), con los minutos
+        laborables del calendario de cada gestor. Devuelve (posición del intervalo, hora, minutos) de los
+        bloques con minutos > 0."""
+        pos, hour, bs, be = hour_blocks(start, end, start_h, end_h)
+        if not len(pos):
+            return pos, hour.astype(int), np.zeros(0)
+        idx = self._index(gestor, int(bs.min()), int(be.max()))
+        mins = (idx.cumulative_ns(pos, be) - idx.cumulative_ns(pos, bs)) / _NS_MIN
+        keep = mins > 0
+        return pos[keep], hour[keep].astype(int), mins[keep]
+
+def as_calendar(calendario) -> WorkCalendar:
+    """Acepta un `WorkCalendar` o una lista de descansos (time, time) como la usada hasta ahora."""
+    if isinstance(calendario, WorkCalendar):
+        return calendario
+    return WorkCalendar(breaks=tuple(calendario or ()))
+
+# ----- lectura del archivo de turnos -----
+
+def _norm(value) -> str:
+    s = unicodedata.normalize("NFD", str(value)).encode("ascii", "ignore").decode()
+    return s.strip().lower()
+
+def _parse_hora(value, campo: str) -> time:
+    s = str(value).strip()
+    if s in ("24:00", "24:00:00"):
+        return time(0, 0)
+    for fmt in ("%H:%M", "%H:%M:%S"):
+        try:
+            return datetime.strptime(s, fmt).time()
+        except ValueError:
+            pass
+    raise ValueError(f"{campo} inválido '{value}' (use HH:MM)")
+
+def _parse_dia(token: str) -> int:
+    t = _norm(token)
+    if t.isdigit() and 0 <= int(t) <= 6:
+        return int(t)
+    if t[:3] in _DIAS:
+        return _DIAS[t[:3]]
+    raise ValueError(f"día inválido '{token}' (use Lun…Dom, 0–6, rangos como Lun-Vie o *)")
+
+def parse_dias(value) -> list[int]:
+    """`*`/vacío = todos; `Lun`, `lunes` o 0–6; listas con coma y rangos `Lun-Vie` (también `Sáb-Lun`)."""
+    s = "" if pd.isna(value) else str(value).strip()
+    if s in ("", TODOS) or _norm(s) == "todos":
+        return list(range(7))
+    dias = []
+    for parte in s.split(","):
+        if "-" in parte:
+            a, b = (_parse_dia(x) for x in parte.split("-", 1))
+            dias.extend((a + k) % 7 for k in range((b - a) % 7 + 1))
+        else:
+            dias.append(_parse_dia(parte))
+    return sorted(set(dias))
+
+def parse_fecha(value) -> date:
+    s = str(value).strip()
+    for fmt in ("%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y", "%Y/%m/%d"):
+        try:
+            return datetime.strptime(s, fmt).date()
+        except ValueError:
+            pass
+    raise ValueError(f"fecha inválida '{value}' (use AAAA-MM-DD o DD/MM/AAAA)")
+
+def read_calendar(source) -> WorkCalendar:
+    """Lee un CSV de turnos con columnas `Gestor`, `Dia`, `Inicio`, `Fin` y opcional `Tipo`
+    (`turno` por defecto, `descanso` o `feriado`; en los feriados `Dia` es la fecha).
+    `Gestor` admite `*` (todos) o varios nombres separados por `;` (un equipo)."""
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    raw = source.read() if hasattr(source, "read") else open(source, "rb").read()
+    try:
+        texto = raw.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        texto = raw.decode("latin1")
+    df = pd.read_csv(io.StringIO(texto), sep=None, engine="python", dtype=str, keep_default_na=False)
+    df.columns = [_norm(c) for c in df.columns]
+    faltan = [c for c in ("gestor", "dia") if c not in df.columns]
+    if faltan:
+        raise ValueError(f"faltan columnas en el archivo de turnos: {', '.join(faltan)}")
+    if "tipo" not in df.columns:
+        df["tipo"] = "turno"
+
+    turnos, descansos, feriados = [], [], []
+    for n, fila in enumerate(df.itertuples(index=False), start=2):
+        try:
+            tipo = _norm(fila.tipo) or "turno"
+            if tipo not in TIPOS_FILA:
+                raise ValueError(f"tipo inválido '{fila.tipo}' (use {', '.join(TIPOS_FILA)})")
+            gestores = [g.strip() for g in str(fila.gestor).split(";") if g.strip()] or [TODOS]
+            if tipo == "feriado":
+                feriados += [(g, parse_fecha(fila.dia)) for g in gestores]
+                continue
+            if "inicio" not in df.columns or "fin" not in df.columns:
+                raise ValueError("los turnos y descansos requieren columnas Inicio y Fin")
+            ini, fin = _parse_hora(fila.inicio, "inicio"), _parse_hora(fila.fin, "fin")
+            if tipo == "descanso" and fin <= ini:
+                raise ValueError(f"el fin del descanso debe ser mayor que el inicio ({fila.inicio}-{fila.fin})")
+            destino = turnos if tipo == "turno" else descansos
+            destino += [(g, d, ini, fin) for g in gestores for d in parse_dias(fila.dia)]
+        except ValueError as e:
+            raise ValueError(f"fila {n} del archivo de turnos: {e}") from None
+    return WorkCalendar(turnos=tuple(turnos), descansos=tuple(descansos), feriados=tuple(feriados))
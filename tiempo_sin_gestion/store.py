@@ -0,0 +1,221 @@
+# tiempo_sin_gestion/store.py
+"""Almacén local particionado por fecha para el modo acumulado."""
+from datetime import time
+import json
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from .cube import breaks_signature, build_cube
+from .ingest import empty_report_frames, shift_with_carry
+from .schedule import WorkCalendar
+
+STORE_DIR = os.environ.get("TSG_STORE_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".store"))
+CLAVE_FILA = ["Gestor", "datetime", "GstCodigo"]
+MAX_DIGESTS_ALMACEN = 1000
+
+def _fecha_file(fecha) -> str:
+    return f"fecha={pd.Timestamp(fecha):%Y-%m-%d}.parquet"
+
+def _row_hashes(df: pd.DataFrame) -> pd.Series:
+    return pd.util.hash_pandas_object(df[CLAVE_FILA], index=False)
+
+def _multiset_difference(new: pd.DataFrame, old: pd.DataFrame) -> pd.DataFrame:
+    """Filas de `new` que no están ya en `old`, contando repeticiones: una fila que aparece dos veces
+    en el export y una vez en el almacén aporta una."""
+    seen = old[CLAVE_FILA].assign(_occ=old.groupby(CLAVE_FILA, dropna=False, sort=False).cumcount().to_numpy(),
+                                  _visto=True)
+    merged = new.assign(_occ=new.groupby(CLAVE_FILA, dropna=False, sort=False).cumcount().to_numpy()).merge(
+        seen, on=CLAVE_FILA + ["_occ"], how="left")
+    return merged.loc[merged["_visto"].isna(), list(new.columns)].reset_index(drop=True)
+
+class LocalStore:
+    """Almacén local particionado por fecha para el modo acumulado:
+
+    - `filas/`: todas las filas válidas (cualquier código), deduplicadas entre cargas;
+    - `nc/`: filas NC/IN con su `prev_any`;
+    - `analisis/<descansos>/{filas,cubo,cubo_horas}/`: minutos netos y cubos por configuración de descansos;
+    - `fechas.parquet` (filas y huella por fecha), `indice.parquet` (última gestión por Gestor y fecha), `meta.json`.
+
+    Cada carga solo reescribe las particiones de las fechas que cambian, así que su coste depende del
+    delta y no del histórico."""
+
+    def __init__(self, root: str):
+        self.root = root
+        self._lock = threading.Lock()
+
+    def _path(self, *parts) -> str:
+        return os.path.join(self.root, *parts)
+
+    def _read(self, *parts) -> pd.DataFrame | None:
+        path = self._path(*parts)
+        return pd.read_parquet(path) if os.path.exists(path) else None
+
+    def _write(self, df: pd.DataFrame, *parts):
+        path = self._path(*parts)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        df.to_parquet(path + ".tmp", index=False)
+        os.replace(path + ".tmp", path)
+
+    def meta(self) -> dict:
+        path = self._path("meta.json")
+        if not os.path.exists(path):
+            return {"version": 0, "cargas": []}
+        with open(path, encoding="utf-8") as f:
+            meta = json.load(f)
+        # almacenes anteriores solo guardaban el digest: formatos desconocidos
+        meta.setdefault("cargas", [[d, None, None] for d in meta.pop("digests", [])])
+        return meta
+
+    def _write_meta(self, meta: dict):
+        os.makedirs(self.root, exist_ok=True)
+        path = self._path("meta.json")
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(path + ".tmp", path)
+
+    def version(self) -> int:
+        return self.meta()["version"]
+
+    def loaded_formats(self, digest: str) -> list[tuple[str | None, str | None]]:
+        """Formatos (fecha, hora) con que ya se incorporó un export con este contenido."""
+        return [(f, h) for d, f, h in self.meta()["cargas"] if d == digest]
+
+    def _fechas(self) -> pd.DataFrame:
+        df = self._read("fechas.parquet")
+        return df if df is not None else pd.DataFrame({"fecha": pd.Series(dtype="datetime64[ns]"),
+                                                       "n": pd.Series(dtype="int64"),
+                                                       "huella": pd.Series(dtype="uint64")})
+
+    def _indice(self) -> pd.DataFrame:
+        df = self._read("indice.parquet")
+        return df if df is not None else pd.DataFrame({"Gestor": pd.Series(dtype=object),
+                                                       "fecha": pd.Series(dtype="datetime64[ns]"),
+                                                       "ultimo": pd.Series(dtype="datetime64[ns]")})
+
+    def append(self, rows: pd.DataFrame, digest: str, report: dict[str, pd.DataFrame]) -> dict:
+        """Incorpora las filas normalizadas de un export (ver `read_rows`) y registra su contenido junto con
+        los formatos de fecha/hora del reporte (ver `loaded_formats`). Solo se abren las fechas cuya
+        huella cambió; `prev_any` se recalcula para los gestor-días con filas nuevas y para el siguiente
+        día con datos de cada uno (su primera brecha apunta a la última gestión del día tocado)."""
+        with self._lock:
+            rows = pd.DataFrame({"Gestor": rows["Gestor"].astype(str), "datetime": rows["datetime"],
+                                 "GstCodigo": rows["GstCodigo"].astype(object), "es_nc": rows["es_nc"]})
+            fecha_fila = rows["datetime"].dt.normalize()
+            huellas = (pd.DataFrame({"fecha": fecha_fila, "h": _row_hashes(rows)})
+                       .groupby("fecha")["h"].agg(["size", "sum"]))
+            fechas = self._fechas()
+            guardadas = {f: (n, h) for f, n, h in zip(fechas["fecha"], fechas["n"], fechas["huella"])}
+            cambiadas = [f for f, n, h in zip(huellas.index, huellas["size"], huellas["sum"])
+                         if guardadas.get(f) != (n, h)]
+
+            indice = self._indice()
+            tocados, n_nuevas = [], 0
+            for fecha, up in rows[fecha_fila.isin(cambiadas)].groupby(fecha_fila[fecha_fila.isin(cambiadas)]):
+                old = self._read("filas", _fecha_file(fecha))
+                nuevas = up.reset_index(drop=True) if old is None else _multiset_difference(up, old)
+                if nuevas.empty:
+                    continue
+                merged = nuevas if old is None else pd.concat([old, nuevas], ignore_index=True)
+                self._write(merged, "filas", _fecha_file(fecha))
+                guardadas[fecha] = (len(merged), _row_hashes(merged).sum())
+                ultimo = merged.groupby("Gestor")["datetime"].max().rename("ultimo").reset_index().assign(fecha=fecha)
+                indice = pd.concat([indice[indice["fecha"] != fecha], ultimo], ignore_index=True)
+                tocados.append(pd.DataFrame({"Gestor": nuevas["Gestor"].unique(), "fecha": fecha}))
+                n_nuevas += len(nuevas)
+
+            gestor_dias = 0
+            if tocados:
+                tocados = pd.concat(tocados, ignore_index=True)
+                siguiente = indice[["Gestor", "fecha"]].sort_values(["Gestor", "fecha"])
+                siguiente["fecha_sig"] = siguiente.groupby("Gestor")["fecha"].shift(-1)
+                extra = (tocados.merge(siguiente, on=["Gestor", "fecha"])[["Gestor", "fecha_sig"]]
+                         .dropna().rename(columns={"fecha_sig": "fecha"}))
+                tocados = pd.concat([tocados, extra], ignore_index=True).drop_duplicates()
+                gestor_dias = len(tocados)
+                for fecha, grupo in tocados.groupby("fecha"):
+                    self._recompute_nc(fecha, set(grupo["Gestor"]), indice)
+
+            fechas = pd.DataFrame({"fecha": pd.to_datetime(list(guardadas)),
+                                   "n": np.array([n for n, _ in guardadas.values()], dtype="int64"),
+                                   "huella": np.array([h for _, h in guardadas.values()], dtype="uint64")})
+            self._write(fechas.sort_values("fecha", ignore_index=True), "fechas.parquet")
+            self._write(indice.sort_values(["fecha", "Gestor"], ignore_index=True), "indice.parquet")
+            for name, df in report.items():
+                self._write(df, f"{name}.parquet")
+            meta = self.meta()
+            meta["version"] += 1
+            formatos = report["reporte"].iloc[0] if len(report["reporte"]) else {}
+            carga = [digest, formatos.get("formato_fecha"), formatos.get("formato_hora")]
+            meta["cargas"] = (meta["cargas"] + [carga])[-MAX_DIGESTS_ALMACEN:]
+            self._write_meta(meta)
+            return {"filas_nuevas": n_nuevas, "fechas": len(cambiadas), "gestor_dias": gestor_dias}
+
+    def _recompute_nc(self, fecha, gestores: set, indice: pd.DataFrame):
+        """Recalcula `prev_any` de los `gestores` en `fecha` partiendo de su última gestión en días previos."""
+        filas = self._read("filas", _fecha_file(fecha))
+        frontera = (indice[(indice["fecha"] < fecha) & indice["Gestor"].isin(gestores)]
+                    .groupby("Gestor")["ultimo"].max())
+        sub, _ = shift_with_carry(filas[filas["Gestor"].isin(gestores)], frontera)
+        nc = sub.loc[sub["es_nc"], ["Gestor", "datetime", "GstCodigo", "prev_any"]]
+        old = self._read("nc", _fecha_file(fecha))
+        if old is not None:
+            nc = pd.concat([old[~old["Gestor"].isin(gestores)], nc], ignore_index=True)
+        nc = nc.sort_values(["Gestor", "datetime"], kind="stable", ignore_index=True)
+        self._write(nc, "nc", _fecha_file(fecha))
+        analisis = self._path("analisis")
+        if os.path.isdir(analisis):
+            for sig in os.listdir(analisis):
+                for kind in ("filas", "cubo", "cubo_horas"):
+                    path = self._path("analisis", sig, kind, _fecha_file(fecha))
+                    if os.path.exists(path):
+                        os.remove(path)
+
+    def load_ingest(self) -> dict[str, pd.DataFrame]:
+        """Bundle equivalente a `load_prepared` con todo el histórico del almacén."""
+        with self._lock:
+            fechas = self._fechas()["fecha"]
+            parts = [df for df in (self._read("nc", _fecha_file(f)) for f in fechas) if df is not None]
+            indice = self._indice()
+            report = {name: self._read(f"{name}.parquet") for name in ("reporte", "rechazos")}
+        nc = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(
+            {"Gestor": [], "datetime": pd.Series(dtype="datetime64[ns]"), "GstCodigo": [],
+             "prev_any": pd.Series(dtype="datetime64[ns]")})
+        nc["Gestor"] = pd.Categorical(nc["Gestor"], categories=sorted(nc["Gestor"].unique()))
+        nc["GstCodigo"] = nc["GstCodigo"].astype("category")
+        nc = nc.sort_values(["Gestor", "datetime"], kind="stable", ignore_index=True)
+        presencia = indice[["Gestor", "fecha"]].astype({"Gestor": "category"})
+        if report["reporte"] is None:
+            report = empty_report_frames()
+        return {"nc": nc, "presencia": presencia, **report}
+
+    def load_analysis(self, calendario: WorkCalendar | list[tuple[time, time]]) -> dict[str, pd.DataFrame]:
+        """Bundle equivalente a `load_cube`; calcula y guarda las particiones que falten para este calendario."""
+        sig = breaks_signature(calendario)
+        kinds = ("filas", "cubo", "cubo_horas")
+        parts = {k: [] for k in kinds}
+        with self._lock:
+            for fecha in self._fechas()["fecha"]:
+                f = _fecha_file(fecha)
+                if all(os.path.exists(self._path("analisis", sig, k, f)) for k in kinds):
+                    for k in kinds:
+                        parts[k].append(self._read("analisis", sig, k, f))
+                    continue
+                nc = self._read("nc", f)
+                if nc is None or nc.empty:
+                    continue
+                res = build_cube(nc, calendario)
+                for k in kinds:
+                    self._write(res[k], "analisis", sig, k, f)
+                    parts[k].append(res[k])
+        if not parts["filas"]:
+            return build_cube(self.load_ingest()["nc"], calendario)
+        out = {k: pd.concat(v, ignore_index=True) for k, v in parts.items()}
+        gestores = sorted(out["filas"]["Gestor"].unique())
+        for df in out.values():
+            df["Gestor"] = pd.Categorical(df["Gestor"], categories=gestores)
+        out["filas"]["GstCodigo"] = out["filas"]["GstCodigo"].astype("category")
+        out["filas"] = out["filas"].sort_values(["Gestor", "datetime"], kind="stable", ignore_index=True)
+        return out
@@ -2,32 +2,69 @@
 import streamlit as st
 import pandas as pd
 import altair as alt
-from datetime import datetime, timedelta, time
+import numpy as np
+from dataclasses import replace
+from datetime import time
+import hashlib
+import json
 import math
+import os
+import shutil
+
+from tiempo_sin_gestion.cache import CACHE_DIR, CACHE_DISK_BUDGET_MB, CACHE_MEM_BUDGET_MB, IngestCache
+from tiempo_sin_gestion.calc import fmt_hhmm_from_minutes, fmt_hhmm_vec
+from tiempo_sin_gestion.cube import INTERVALOS_MIN, breaks_signature, cube_masks, load_cube
+from tiempo_sin_gestion.engine import (COLUMNAS_DETALLE, ORDENES_DETALLE, AnalysisParams, detail_mask,
+                                       detail_rows, detail_sort_orders, gestor_summary, heatmap_table,
+                                       hour_matrix, matrix_frame, paginate, style_matrix)
+from tiempo_sin_gestion.export import FORMATOS_EXPORT, MIME_EXPORT, write_export
+from tiempo_sin_gestion.ingest import (CODIGOS_PERMITIDOS, FORMATO_AUTO, FORMATOS_FECHA, FORMATOS_HORA,
+                                       content_digest, ingest_key, load_prepared, read_rows)
+from tiempo_sin_gestion.live import LiveMonitor
+from tiempo_sin_gestion.perf import StageRecorder, install, stage
+from tiempo_sin_gestion.schedule import TODOS, WorkCalendar, parse_fecha, read_calendar
+from tiempo_sin_gestion.store import STORE_DIR, LocalStore
 
 # ========= Helpers =========
 
 from streamlit.components.v1 import html as st_html
 
-def render_gestor_cards(df_resumen, total_min, top_n=None, key="gestor"):
-    """Renderiza tarjetas bonitas por Gestor usando un componente HTML (sin que Streamlit las escape)."""
+TAMANOS_PAGINA_CARDS = [12, 24, 48, 96]
+
+def render_gestor_cards(df_resumen, total_min, key="gestor", page_size=TAMANOS_PAGINA_CARDS[0]):
+    """Renderiza tarjetas bonitas por Gestor usando un componente HTML (sin que Streamlit las escape).
+
+    Los datos viajan una sola vez como JSON columnar; la búsqueda, el orden y la paginación ocurren en el
+    navegador y solo se dibujan las tarjetas de la página visible (sin re-ejecutar Python)."""
     if df_resumen is None or df_resumen.empty:
         st.info("No hay datos para mostrar tarjetas.")
         return
 
-    df_show = df_resumen.sort_values("minutos_sin_gestion", ascending=False).copy()
-    if top_n is not None:
-        df_show = df_show.head(top_n)
-
-    # Cálculo de alto del iframe en función de cuántas cards hay
-    n = len(df_show)
+    df_show = df_resumen.sort_values("minutos_sin_gestion", ascending=False, kind="stable")
+    mins = df_show["minutos_sin_gestion"].astype(float).to_numpy()
+    pct = np.zeros(len(mins)) if total_min <= 0 else np.clip(mins / float(total_min) * 100, 0, 100)
+    intentos = (df_show["intentos_nc_inu"] if "intentos_nc_inu" in df_show else pd.Series(0, index=df_show.index))
+    datos = {
+        "gestor": df_show["Gestor"].astype(str).tolist(),
+        "min": mins.round(4).tolist(),
+        "hhmm": fmt_hhmm_vec(mins).tolist(),
+        "pct": pct.round().astype(int).tolist(),
+        "intentos": intentos.fillna(0).astype(int).tolist(),
+    }
+    # "</" escapado para que un nombre no pueda cerrar el <script>
+    payload = json.dumps(datos, ensure_ascii=False).replace("</", "<\\/")
+
+    # Alto del iframe para una página inicial; páginas más grandes hacen scroll dentro del componente
+    n = min(len(df_show), page_size)
     cols = 4   # hasta 4 columnas responsivas
     rows = math.ceil(n / cols)
-    height = 170 * rows + 40  # alto aproximado (ajusta si quieres más compacto / alto)
+    height = 170 * rows + 40 + 56  # + barra de búsqueda/orden/paginación
 
     # CSS scopeado con un id único para evitar colisiones
     root_id = f"cards-{key}"
-    styles = f"""
+    opciones_pagina = "".join(f'<option value="{t}"{" selected" if t == page_size else ""}>{t}</option>'
+                              for t in TAMANOS_PAGINA_CARDS)
+    html = f"""
     <style>
       #{root_id} {{
         font-family: system-ui, -apple-system, Segoe UI, Roboto, Ubuntu, Cantarell, 'Helvetica Neue', Arial, 'Noto Sans', 'Apple Color Emoji','Segoe UI Emoji';
@@ -46,7 +83,7 @@ def render_gestor_cards(df_resumen, total_min, top_n=None, key="gestor"):
       }}
       #{root_id} .name {{
         font-weight: 600; font-size: 0.95rem; color: #111827; letter-spacing: .2px;
-        margin-bottom: 4px;
+        margin-bottom: 4px; white-space: nowrap; overflow: hidden; text-overflow: ellipsis;
       }}
       #{root_id} .value {{
         font-weight: 800; font-size: 1.6rem; margin: 6px 0 8px 0;
@@ -58,95 +95,252 @@ def render_gestor_cards(df_resumen, total_min, top_n=None, key="gestor"):
         display:inline-block; font-size:12px; background:#f1f5f9; color:#334155;
         padding:2px 10px; border-radius:999px;
       }}
+      #{root_id} .toolbar {{
+        display:flex; flex-wrap:wrap; align-items:center; gap:8px; margin-bottom:12px; font-size:13px; color:#334155;
+      }}
+      #{root_id} .toolbar input, #{root_id} .toolbar select, #{root_id} .toolbar button {{
+        font:inherit; padding:5px 10px; border:1px solid #e2e8f0; border-radius:8px; background:#fff;
+      }}
+      #{root_id} .toolbar input {{ flex:1 1 180px; min-width:140px; }}
+      #{root_id} .toolbar button:disabled {{ opacity:.4; }}
+      #{root_id} .toolbar .info {{ margin-left:auto; }}
+      #{root_id} .empty {{ color:#64748b; padding:12px 4px; }}
     </style>
-    """
-
-    # Cards
-    def row_html(row):
-        mins = float(row["minutos_sin_gestion"])
-        hhmm = fmt_hhmm_from_minutes(mins)
-        pct = 0 if total_min <= 0 else (mins / float(total_min)) * 100
-        intentos = int(row.get("intentos_nc_inu", 0))
-        return f"""
-          <div class="card">
-            <div class="name">{row['Gestor']}</div>
-            <div class="value">{hhmm}<span class="muted"> h</span></div>
-            <div class="bar"><div style="width:{pct:.0f}%"></div></div>
-            <span class="chip">Intentos NC/IN: {intentos}</span>
-          </div>
-        """
-
-    cards_html = "\n".join(row_html(r) for _, r in df_show.iterrows())
-    html = f"""
-      {styles}
-      <div id="{root_id}">
-        <div class="grid">
-          {cards_html}
-        </div>
+    <div id="{root_id}">
+      <div class="toolbar">
+        <input type="search" class="buscar" placeholder="Buscar gestor…">
+        <select class="orden">
+          <option value="min_desc">Más tiempo primero</option>
+          <option value="min_asc">Menos tiempo primero</option>
+          <option value="nombre">Nombre (A–Z)</option>
+          <option value="intentos">Más intentos NC/IN</option>
+        </select>
+        <select class="tam" title="Tarjetas por página">{opciones_pagina}</select>
+        <button class="prev" title="Página anterior">‹</button>
+        <button class="next" title="Página siguiente">›</button>
+        <span class="info"></span>
       </div>
+      <div class="grid"></div>
+    </div>
+    <script>
+    (function() {{
+      const D = {payload};
+      const root = document.getElementById("{root_id}");
+      const q = s => root.querySelector(s);
+      const grid = q(".grid"), info = q(".info");
+      const N = D.gestor.length;
+      const norm = s => s.normalize("NFD").replace(/[\\u0300-\\u036f]/g, "").toLowerCase();
+      const claves = D.gestor.map(norm);
+      const coll = new Intl.Collator("es", {{numeric: true, sensitivity: "base"}});
+      // los datos llegan ordenados por minutos desc; los demás órdenes se calculan una vez y se reutilizan
+      const base = Array.from({{length: N}}, (_, i) => i);
+      const ordenes = {{
+        min_desc: () => base,
+        min_asc: () => base.slice().reverse(),
+        nombre: () => base.slice().sort((a, b) => coll.compare(D.gestor[a], D.gestor[b])),
+        intentos: () => base.slice().sort((a, b) => D.intentos[b] - D.intentos[a] || a - b),
+      }};
+      const cache = {{}};
+      let pagina = 0, vista = base;
+
+      function card(i) {{
+        const c = document.createElement("div");
+        c.className = "card";
+        c.innerHTML = '<div class="name"></div><div class="value"><span class="hhmm"></span><span class="muted"> h</span></div>'
+          + '<div class="bar"><div></div></div><span class="chip"></span>';
+        const nombre = c.querySelector(".name");
+        nombre.textContent = D.gestor[i];
+        nombre.title = "#" + (i + 1) + " · " + D.gestor[i];
+        c.querySelector(".hhmm").textContent = D.hhmm[i];
+        c.querySelector(".bar > div").style.width = D.pct[i] + "%";
+        c.querySelector(".chip").textContent = "Intentos NC/IN: " + D.intentos[i];
+        return c;
+      }}
+
+      function dibujar() {{
+        const tam = +q(".tam").value;
+        const paginas = Math.max(1, Math.ceil(vista.length / tam));
+        pagina = Math.min(Math.max(pagina, 0), paginas - 1);
+        const desde = pagina * tam, hasta = Math.min(desde + tam, vista.length);
+        const frag = document.createDocumentFragment();
+        for (let k = desde; k < hasta; k++) frag.appendChild(card(vista[k]));
+        if (!vista.length) {{
+          const e = document.createElement("div");
+          e.className = "empty";
+          e.textContent = "Ningún gestor coincide con la búsqueda.";
+          frag.appendChild(e);
+        }}
+        grid.replaceChildren(frag);
+        info.textContent = vista.length
+          ? (desde + 1) + "–" + hasta + " de " + vista.length + (vista.length < N ? " (de " + N + ")" : "")
+          : "0 de " + N;
+        q(".prev").disabled = pagina === 0;
+        q(".next").disabled = pagina >= paginas - 1;
+      }}
+
+      function filtrar() {{
+        const orden = q(".orden").value;
+        const todos = cache[orden] || (cache[orden] = ordenes[orden]());
+        const t = norm(q(".buscar").value.trim());
+        vista = t ? todos.filter(i => claves[i].includes(t)) : todos;
+        pagina = 0;
+        dibujar();
+      }}
+
+      q(".buscar").addEventListener("input", filtrar);
+      q(".orden").addEventListener("change", filtrar);
+      q(".tam").addEventListener("change", () => {{ pagina = 0; dibujar(); }});
+      q(".prev").addEventListener("click", () => {{ pagina--; dibujar(); }});
+      q(".next").addEventListener("click", () => {{ pagina++; dibujar(); }});
+      filtrar();
+    }})();
+    </script>
     """
-    st_html(html, height=height, scrolling=False)
-    
-def fmt_hhmm_from_minutes(mins):
-    try:
-        secs = int(round(float(mins) * 60))
-    except Exception:
-        return "00:00"
-    if secs < 0: secs = 0
-    h = secs // 3600
-    m = (secs % 3600) // 60
-    return f"{h:02d}:{m:02d}"
-
-def minutes_excluding_breaks(start_ts: datetime, end_ts: datetime, breaks: list[tuple[time, time]]):
-    """Minutos del intervalo [start_ts, end_ts) excluyendo solapes con descansos diarios."""
-    if pd.isna(start_ts) or pd.isna(end_ts) or end_ts <= start_ts:
-        return 0.0
-    total = (end_ts - start_ts).total_seconds() / 60.0
-    if total <= 0:
-        return 0.0
-    d = start_ts.date()
-    end_d = end_ts.date()
-    overlap = 0.0
-    while d <= end_d:
-        for bstart, bend in breaks:
-            bs = datetime.combine(d, bstart)
-            be = datetime.combine(d, bend)
-            s = max(start_ts, bs)
-            e = min(end_ts, be)
-            if e > s:
-                overlap += (e - s).total_seconds() / 60.0
-        d += timedelta(days=1)
-    return max(0.0, total - overlap)
-
-def split_interval_by_hours_excl_breaks(start_ts: datetime, end_ts: datetime,
-                                        breaks: list[tuple[time, time]],
-                                        start_h: int, end_h: int):
-    """Divide [start_ts, end_ts) en bloques de 1h; devuelve (hour, minutos_netos_sin_break) por bloque."""
-    out = []
-    if pd.isna(start_ts) or pd.isna(end_ts) or end_ts <= start_ts:
-        return out
-    cur = start_ts.replace(minute=0, second=0, microsecond=0)
-    if cur > start_ts:
-        cur -= timedelta(hours=1)
-    while cur < end_ts:
-        nxt = cur + timedelta(hours=1)
-        s = max(start_ts, cur)
-        e = min(end_ts, nxt)
-        if e > s:
-            mins_block = (e - s).total_seconds() / 60.0
-            d = s.date()
-            for bstart, bend in breaks:
-                bs = datetime.combine(d, bstart)
-                be = datetime.combine(d, bend)
-                ss = max(s, bs)
-                ee = min(e, be)
-                if ee > ss:
-                    mins_block -= (ee - ss).total_seconds() / 60.0
-            mins_block = max(0.0, mins_block)
-            if start_h <= cur.hour < end_h and mins_block > 0:
-                out.append((cur.hour, mins_block))
-        cur = nxt
-    return out
+    st_html(html, height=height, scrolling=True)
+
+def contexto_plano(contexto: dict) -> dict:
+    return {k: (", ".join(map(str, v)) if isinstance(v, (list, tuple)) else v) for k, v in contexto.items()}
+
+def render_perf_panel(recorder: StageRecorder, contexto: dict):
+    """Panel plegable con las etapas medidas en esta ejecución y su descarga en JSON/CSV."""
+    etapas = recorder.frame()
+    with st.expander("🩺 Diagnóstico de rendimiento", expanded=False):
+        vista = etapas.assign(etapa=["\u2003" * n + e for n, e in zip(etapas["nivel"], etapas["etapa"])])
+        st.dataframe(vista.drop(columns="nivel"), use_container_width=True, hide_index=True,
+                     column_config={"segundos": st.column_config.NumberColumn(format="%.3f"),
+                                    "pico_mb": st.column_config.NumberColumn("pico (MB)", format="%.1f")})
+        total = etapas.loc[etapas["nivel"] == 0, "segundos"].sum()
+        st.caption(f"Total medido: **{total:.2f} s**. El pico de memoria es lo asignado por encima de lo que "
+                   "había al iniciar cada etapa (memoria del proceso, incluye otras sesiones activas). "
+                   "Los cambios dentro de una pestaña solo re-ejecutan esa pestaña y no actualizan este panel.")
+        st.json(contexto, expanded=False)
+        c1, c2 = st.columns(2)
+        c1.download_button("📥 Descargar JSON", data=recorder.to_json(contexto),
+                           file_name="diagnostico_rendimiento.json", mime="application/json")
+        c2.download_button("📥 Descargar CSV", data=etapas.assign(**contexto_plano(contexto)).to_csv(index=False),
+                           file_name="diagnostico_rendimiento.csv", mime="text/csv")
+
+TAMANOS_PAGINA = [50, 100, 250, 500, 1000]
+
+def memo(name: str, key, build):
+    """Resultado de `name` para estas entradas (`key`, que incluye el hash del archivo y los parámetros).
+    Se guarda en la caché del proceso: lo comparten todas las sesiones, las peticiones simultáneas se
+    calculan una sola vez y cuenta para el límite global de memoria. Es compartido: no mutarlo."""
+    clave = hashlib.sha256(repr((name, key)).encode()).hexdigest()[:32]
+    return get_ingest_cache().get(f"res-{clave}", build, persist=False)
+
+def export_section(name: str, key, build_sheets, stem: str):
+    """Exportación bajo demanda: el archivo solo se genera al pulsar «Generar» y se escribe a disco por
+    bloques; la sesión conserva la ruta (no el contenido) mientras no cambien las entradas (`key`).
+    `st.download_button` carga el archivo completo en memoria, así que solo se muestra en la ejecución que
+    lo generó o al pedirlo con «Preparar descarga», no en cada rerun del fragmento."""
+    c1, c2 = st.columns([1, 2])
+    fmt = c1.selectbox("Formato", list(FORMATOS_EXPORT), format_func=FORMATOS_EXPORT.get, key=f"{name}_fmt")
+    exportes = st.session_state.setdefault("_exportes", {})
+    clave = (key, fmt)
+    recien_generado = False
+    if c2.button("⚙️ Generar archivo", key=f"{name}_generar"):
+        with st.spinner("Generando archivo…"), stage(f"export_{name}") as etapa:
+            sheets = build_sheets()
+            etapa.filas_entrada = sum(len(df) for df in sheets.values())
+            path = write_export(sheets, fmt, stem=stem)
+        anterior = exportes.get(name)
+        if anterior and anterior[1]:
+            shutil.rmtree(os.path.dirname(anterior[1]), ignore_errors=True)
+        exportes[name] = (clave, path)
+        recien_generado = True
+    hecho = exportes.get(name)
+    if hecho and hecho[0] != clave:
+        # el archivo ya no corresponde a las entradas: se borra del disco en cuanto cambian
+        if hecho[1]:
+            shutil.rmtree(os.path.dirname(hecho[1]), ignore_errors=True)
+            exportes[name] = (hecho[0], None)
+        st.caption("Los filtros o el formato cambiaron desde la última exportación; genera el archivo de nuevo.")
+    elif hecho and hecho[1] and os.path.exists(hecho[1]):
+        nombre = os.path.basename(hecho[1])
+        if recien_generado or st.button(f"📦 Preparar descarga de {nombre}", key=f"{name}_preparar"):
+            ext = os.path.splitext(nombre)[1].lstrip(".")
+            with open(hecho[1], "rb") as f:
+                st.download_button(f"📥 Descargar {nombre}", data=f, file_name=nombre, mime=MIME_EXPORT[ext],
+                                   key=f"{name}_descargar")
+
+# ========= Recursos compartidos =========
+@st.cache_resource
+def get_ingest_cache() -> IngestCache:
+    return IngestCache(CACHE_DIR, CACHE_MEM_BUDGET_MB, CACHE_DISK_BUDGET_MB)
+
+@st.cache_resource
+def get_local_store() -> LocalStore:
+    return LocalStore(STORE_DIR)
+
+def file_digest(uploaded_file) -> str:
+    """sha256 del contenido del archivo subido (memorizado por file_id en la sesión)."""
+    file_id = getattr(uploaded_file, "file_id", None)
+    cached = st.session_state.get("_ingesta_digest")
+    if file_id is not None and cached and cached[0] == file_id:
+        return cached[1]
+    digest = content_digest(uploaded_file.getvalue())
+    st.session_state["_ingesta_digest"] = (file_id, digest)
+    return digest
+
+@st.cache_resource(max_entries=8)
+def get_live_monitor(path: str, firma_calendario: str, fmt_fecha, fmt_hora, _calendario: WorkCalendar) -> LiveMonitor:
+    """Un monitor por carpeta + calendario + formatos, compartido por todas las sesiones que la siguen."""
+    return LiveMonitor(path, _calendario, fmt_fecha, fmt_hora)
+
+def live_panel(monitor: LiveMonitor, min_interval: int, refresco: int):
+    """Monitoreo en vivo: en cada refresco ingiere solo lo nuevo y recalcula los KPIs sobre el cubo acumulado."""
+    with stage("tab_vivo"):
+        try:
+            nuevas = monitor.poll()
+        except KeyError as e:
+            st.error(f"El archivo monitoreado no contiene la columna obligatoria '{e.args[0]}'.")
+            return
+        snap = monitor.snapshot()
+        st.caption(f"Última lectura {snap['ultima_lectura']:%H:%M:%S}: {nuevas:,} filas nuevas · "
+                   f"{snap['filas']:,} filas en {snap['archivos']} archivo(s) · se actualiza cada {refresco} s.")
+        if snap["relecturas"]:
+            st.caption(f"Acumulado reconstruido desde cero {snap['relecturas']:,} vez(es): un archivo se truncó "
+                       "o se reemplazó con otro contenido.")
+        if snap["fuera_de_orden"]:
+            st.warning(f"{snap['fuera_de_orden']:,} filas llegaron con fecha-hora anterior a la última gestión "
+                       "ya leída de su Gestor: cuentan como intento, pero no corrigen el intervalo ya calculado.")
+        if snap["fechas"] is None:
+            st.info("Aún no hay filas con fecha-hora y Gestor válidos en la ruta monitoreada.")
+            return
+        desde, hasta = snap["fechas"]
+        clave = (monitor.path, monitor.calendario.signature(), monitor.fmt_fecha, monitor.fmt_hora,
+                 snap["version"], min_interval)
+        en_rango, cuenta = cube_masks(snap["cubo"], desde, hasta, [], min_interval)
+        resumen = memo("vivo_resumen", clave, lambda: gestor_summary(snap["cubo"], en_rango, cuenta))
+        total_min = resumen["minutos_sin_gestion"].sum()
+
+        c1, c2, c3 = st.columns(3)
+        c1.metric("⏱ Total sin gestión", f"{fmt_hhmm_from_minutes(total_min)} h")
+        c2.metric("📊 Promedio por Gestor",
+                  f"{fmt_hhmm_from_minutes(resumen['minutos_sin_gestion'].mean() if len(resumen) else 0)} h")
+        c3.metric("📞 Intentos NC/IN", f"{int(resumen['intentos_nc_inu'].sum()):,}" if len(resumen) else "0")
+
+        st.markdown("### ⏳ Sin gestión ahora")
+        ahora = monitor.idle_now()
+        ahora["hhmm"] = fmt_hhmm_vec(ahora["minutos_sin_gestion"])
+        st.dataframe(ahora[["Gestor", "ultima_gestion", "hhmm", "minutos_sin_gestion"]], hide_index=True,
+                     use_container_width=True, height=260,
+                     column_config={"ultima_gestion": st.column_config.DatetimeColumn("Última gestión",
+                                                                                      format="YYYY-MM-DD HH:mm:ss"),
+                                    "hhmm": "Sin gestión (HH:MM)",
+                                    "minutos_sin_gestion": st.column_config.NumberColumn("Minutos", format="%.1f")})
+
+        st.markdown("### 🧑‍💼 Tiempo sin gestión por Gestor (HH:MM)")
+        render_gestor_cards(resumen, total_min, key="vivo")
+
+        st.markdown("### 🧮 Matriz Hora × Gestor")
+        matrices = memo("vivo_matriz", clave, lambda: hour_matrix(snap, AnalysisParams(min_interval=min_interval),
+                                                                   desde.date(), hasta.date()))
+        if matrices is None:
+            st.info("No hay minutos acumulados en el rango horario 06–21.")
+        else:
+            st.dataframe(style_matrix(matrices[0], 30), use_container_width=True)
 
 # ========= App config =========
 st.set_page_config(page_title="Análisis de Tiempo sin Gestión", layout="wide")
@@ -155,45 +349,167 @@ st.title("📊 Análisis de Tiempo sin Gestión Telefónica")
 # ========= Sidebar =========
 st.sidebar.header("Configuración")
 uploaded_file = st.sidebar.file_uploader("Sube el archivo CSV", type=["csv"])
-min_interval = st.sidebar.selectbox("Intervalo mínimo (minutos)", [1, 2, 3, 5], index=3)
-
-# Refrigerio
-excluir_refrigerio = st.sidebar.checkbox("Excluir horario de refrigerio", value=True)
-ref_inicio = st.sidebar.time_input("Inicio refrigerio", value=time(13, 0))
-ref_fin    = st.sidebar.time_input("Fin refrigerio",    value=time(14, 30))
-if (datetime.combine(datetime.today(), ref_fin) <= datetime.combine(datetime.today(), ref_inicio)):
-    st.sidebar.warning("El fin de refrigerio debe ser mayor que el inicio. Se usará 13:00–14:30.")
-    ref_inicio, ref_fin = time(13, 0), time(14, 30)
-breaks_cfg = [(ref_inicio, ref_fin)] if excluir_refrigerio else []
-
-if not uploaded_file:
-    st.info("📁 Por favor, sube un archivo CSV para comenzar.")
+min_interval = st.sidebar.selectbox("Intervalo mínimo (minutos)", INTERVALOS_MIN, index=3)
+
+# Descansos generales (refrigerio y pausas) y calendario laboral
+excluir_refrigerio = st.sidebar.checkbox("Excluir descansos (refrigerio y pausas)", value=True)
+descansos_tabla = st.sidebar.data_editor(
+    pd.DataFrame({"Inicio": [time(13, 0)], "Fin": [time(14, 30)]}), num_rows="dynamic", hide_index=True,
+    key="descansos_cfg", disabled=not excluir_refrigerio,
+    column_config={"Inicio": st.column_config.TimeColumn("Inicio", format="HH:mm", step=60),
+                   "Fin": st.column_config.TimeColumn("Fin", format="HH:mm", step=60)},
+)
+breaks_cfg = []
+for ini, fin in descansos_tabla.dropna().itertuples(index=False):
+    if fin <= ini:
+        st.sidebar.warning(f"Descanso {ini:%H:%M}–{fin:%H:%M} ignorado: el fin debe ser mayor que el inicio.")
+        continue
+    breaks_cfg.append((ini, fin))
+if not excluir_refrigerio:
+    breaks_cfg = []
+
+with st.sidebar.expander("Calendario laboral (turnos y feriados)"):
+    turnos_file = st.file_uploader(
+        "Turnos por gestor (CSV)", type=["csv"], key="turnos_file",
+        help="Columnas Gestor, Dia, Inicio, Fin y opcional Tipo (turno, descanso o feriado). "
+             "Gestor admite `*` (todos) o varios nombres separados por `;`; Dia admite Lun…Dom, rangos "
+             "como Lun-Vie o `*`; en los feriados, Dia es la fecha. Sin turno, el gestor trabaja las 24 h.")
+    feriados_txt = st.text_area("Feriados (una fecha por línea, AAAA-MM-DD)", key="feriados_txt")
+calendario = WorkCalendar()
+if turnos_file is not None:
+    try:
+        calendario = read_calendar(turnos_file.getvalue())
+    except ValueError as e:
+        st.sidebar.error(f"No se pudo leer el archivo de turnos: {e}")
+feriados = []
+for linea in feriados_txt.splitlines():
+    if linea.strip():
+        try:
+            feriados.append((TODOS, parse_fecha(linea)))
+        except ValueError as e:
+            st.sidebar.error(str(e))
+calendario = replace(calendario, feriados=calendario.feriados + tuple(feriados)).with_breaks(breaks_cfg)
+resumen_cal = calendario.resumen()
+nota_calendario = (f"Descansos excluidos: **{', '.join(resumen_cal['descansos'])}**" if breaks_cfg
+                   else "Sin exclusión de descansos")
+if calendario.turnos:
+    nota_calendario += (f"; turnos propios de {resumen_cal['gestores_con_turno']} gestor(es)"
+                        + (" y turno general para el resto" if resumen_cal["turno_general"] else ""))
+if calendario.descansos:
+    nota_calendario += "; descansos por gestor"
+if calendario.feriados:
+    nota_calendario += f"; {resumen_cal['feriados']} feriado(s)"
+
+carga_por_bloques = st.sidebar.checkbox(
+    "Carga por bloques (archivos muy grandes)", value=False,
+    help="Lee el CSV por bloques y conserva solo lo necesario; reduce el pico de memoria con el mismo resultado. "
+         "Requiere un export en orden cronológico por Gestor: si no lo está, se lee completo."
+)
+
+with st.sidebar.expander("Formato de fecha/hora del export"):
+    fmt_fecha_opt = st.selectbox("Formato de FchCreacion", [FORMATO_AUTO] + FORMATOS_FECHA)
+    fmt_hora_opt = st.selectbox("Formato de HraCreacion", [FORMATO_AUTO] + FORMATOS_HORA)
+
+modo_acumulado = st.sidebar.checkbox(
+    "Modo acumulado (almacén local)", value=False,
+    help="Agrega cada CSV subido a un histórico local por fecha (sin duplicar filas ya cargadas) y analiza el histórico."
+)
+store = get_local_store() if modo_acumulado else None
+
+modo_vivo = st.sidebar.checkbox(
+    "Monitoreo en vivo (carpeta de exports)", value=False,
+    help="Sigue una carpeta local (sus *.csv) o un CSV que crece durante el día; en cada refresco lee solo "
+         "las filas nuevas y actualiza KPIs, tarjetas y matriz."
+)
+if modo_vivo:
+    ruta_vivo = st.sidebar.text_input("Carpeta o CSV a monitorear", key="vivo_ruta")
+    refresco = int(st.sidebar.number_input("Actualizar cada (segundos)", min_value=5, max_value=600, value=30,
+                                           step=5, key="vivo_refresco"))
+
+diagnostico = st.sidebar.checkbox(
+    "Diagnóstico de rendimiento", value=False,
+    help="Mide tiempo, filas y pico de memoria de cada etapa en cada ejecución; se muestra al final de la página."
+)
+recorder = StageRecorder() if diagnostico else None
+install(recorder)
+
+fmt_fecha = None if fmt_fecha_opt == FORMATO_AUTO else fmt_fecha_opt
+fmt_hora = None if fmt_hora_opt == FORMATO_AUTO else fmt_hora_opt
+
+# ========= Monitoreo en vivo =========
+if modo_vivo:
+    st.subheader("📡 Monitoreo en vivo")
+    if not ruta_vivo:
+        st.info("📁 Indica en la barra lateral la carpeta (o el CSV) donde el marcador deja los exports.")
+        st.stop()
+    if not os.path.exists(ruta_vivo):
+        st.error(f"No existe la ruta '{ruta_vivo}'.")
+        st.stop()
+    monitor = get_live_monitor(os.path.abspath(ruta_vivo), breaks_signature(calendario), fmt_fecha, fmt_hora,
+                               calendario)
+    st.fragment(run_every=refresco)(live_panel)(monitor, min_interval, refresco)
     st.stop()
 
-# ========= Carga =========
-try:
-    df_raw = pd.read_csv(uploaded_file, encoding="latin1", on_bad_lines="skip")
-except Exception as e:
-    st.error(f"❌ Error al procesar el archivo: {e}")
+if not uploaded_file and not (store and store.version()):
+    st.info("📁 Por favor, sube un archivo CSV para comenzar.")
     st.stop()
 
-for col in ["FchCreacion", "HraCreacion", "Gestor", "GstCodigo"]:
-    if col not in df_raw.columns:
-        st.error(f"El archivo no contiene la columna obligatoria '{col}'.")
+# ========= Carga =========
+with stage("carga") as etapa:
+    try:
+        if store:
+            cargas = store.loaded_formats(file_digest(uploaded_file)) if uploaded_file else []
+            # en automático se vuelve a detectar el mismo formato: solo un formato explícito distinto recarga
+            previa = next((c for c in cargas if fmt_fecha in (None, c[0]) and fmt_hora in (None, c[1])), None)
+            if uploaded_file and previa:
+                st.sidebar.info(f"Este archivo ya está en el almacén (fecha `{previa[0] or 'inferida'}`, hora "
+                                f"`{previa[1] or 'inferida'}`); no se volvió a cargar. Para corregir el formato, "
+                                "elígelo explícitamente en la barra lateral.")
+            elif uploaded_file:
+                with st.spinner("Agregando el archivo al almacén local…"):
+                    filas_subidas, reporte_subida = read_rows(uploaded_file, fmt_fecha, fmt_hora)
+                    res = store.append(filas_subidas, file_digest(uploaded_file), reporte_subida)
+                    del filas_subidas
+                st.sidebar.success(f"Almacén: {res['filas_nuevas']:,} filas nuevas; "
+                                   f"{res['gestor_dias']:,} gestor-días recalculados.")
+                if cargas:
+                    st.sidebar.warning("Este archivo ya se había cargado con otro formato de fecha/hora: sus filas "
+                                       "con las fechas de esa carga siguen en el almacén.")
+            clave_ingesta = f"almacen-v{store.version()}"
+            ingesta = get_ingest_cache().get(clave_ingesta, store.load_ingest, persist=False)
+        else:
+            clave_ingesta = ingest_key(file_digest(uploaded_file), fmt_fecha, fmt_hora)
+            ingesta = load_prepared(uploaded_file, clave_ingesta, get_ingest_cache(), chunked=carga_por_bloques,
+                                    fmt_fecha=fmt_fecha, fmt_hora=fmt_hora)
+    except KeyError as e:
+        st.error(f"El archivo no contiene la columna obligatoria '{e.args[0]}'.")
         st.stop()
-
-# ========= Preparación =========
-df_raw["datetime"] = pd.to_datetime(
-    df_raw["FchCreacion"].astype(str).str.strip() + " " + df_raw["HraCreacion"].astype(str).str.strip(),
-    errors="coerce"
-)
-df = df_raw.dropna(subset=["datetime", "Gestor"]).copy()
-df["Gestor"] = df["Gestor"].astype(str).str.strip()
-df["GstCodigo_norm"] = df["GstCodigo"].astype(str).str.strip().str.lower()
+    except Exception as e:
+        st.error(f"❌ Error al procesar el archivo: {e}")
+        st.stop()
+    etapa.filas_salida = len(ingesta["nc"])
+nc_all, presencia = ingesta["nc"], ingesta["presencia"]
+
+reporte = ingesta["reporte"].iloc[0]
+st.sidebar.caption(f"Formato leído: `{reporte['formato_fecha'] or 'inferido'}` + `{reporte['formato_hora'] or 'inferido'}`")
+if carga_por_bloques and not store and reporte.get("relectura_completa", False):
+    st.sidebar.warning("El export no está en orden cronológico por Gestor: se leyó completo en memoria, "
+                       "sin el límite de la carga por bloques.")
+n_rechazadas = int(reporte["fecha_hora_invalida"]) + int(reporte["sin_gestor"])
+if n_rechazadas:
+    st.warning(f"⚠️ {n_rechazadas:,} de {int(reporte['filas']):,} filas se excluyeron: "
+               f"{int(reporte['fecha_hora_invalida']):,} con FchCreacion/HraCreacion no interpretable y "
+               f"{int(reporte['sin_gestor']):,} sin Gestor. Revisa el formato de fecha/hora en la barra lateral.")
+    if not ingesta["rechazos"].empty:
+        with st.expander("Ver ejemplos de filas con fecha/hora no interpretable"):
+            st.dataframe(ingesta["rechazos"], use_container_width=True)
+if presencia.empty:
+    st.warning("El archivo no contiene filas con fecha-hora y Gestor válidos.")
+    st.stop()
 
 # Filtros de fecha/gestor
-min_date = df["datetime"].dt.date.min()
-max_date = df["datetime"].dt.date.max()
+min_date = presencia["fecha"].min().date()
+max_date = presencia["fecha"].max().date()
 date_range = st.sidebar.date_input("Rango de fechas", value=(min_date, max_date),
                                    min_value=min_date, max_value=max_date)
 if isinstance(date_range, (list, tuple)) and len(date_range) == 2:
@@ -203,57 +519,53 @@ else:
 if start_date > end_date:
     start_date, end_date = min_date, max_date
 
-df = df[(df["datetime"].dt.date >= start_date) & (df["datetime"].dt.date <= end_date)].copy()
-if df.empty:
+presencia_rango = presencia[(presencia["fecha"] >= pd.Timestamp(start_date)) &
+                            (presencia["fecha"] <= pd.Timestamp(end_date))]
+if presencia_rango.empty:
     st.warning("No hay datos para el rango de fechas seleccionado.")
     st.stop()
 
-gestores_disponibles = sorted(df["Gestor"].unique().tolist())
+gestores_disponibles = sorted(presencia_rango["Gestor"].unique().tolist())
 gestores_seleccionados = st.sidebar.multiselect("Selecciona Gestor(es)",
                                                 options=gestores_disponibles,
                                                 default=gestores_disponibles)
-if gestores_seleccionados:
-    df = df[df["Gestor"].isin(gestores_seleccionados)].copy()
-if df.empty:
-    st.warning("No hay datos para los filtros seleccionados.")
-    st.stop()
 
 # ========= LÓGICA CORRECTA =========
-# 1) Ordenamos TODO por Gestor/fecha-hora y calculamos la gestión previa REAL (cualquier código)
-df = df.sort_values(["Gestor", "datetime"]).copy()
-df["prev_any"] = df.groupby("Gestor")["datetime"].shift(1)
-
-# 2) Nos quedamos SOLO con filas actuales que sean NoContacto / Inubicado
-codigos_permitidos = {"nocontacto", "inubicado"}
-df_nc = df[df["GstCodigo_norm"].isin(codigos_permitidos)].copy()
-if df_nc.empty:
+# 1) La gestión previa REAL (cualquier código) viene calculada por Gestor en la carga; dentro del
+#    rango de fechas solo vale si también cae en el rango (equivale a ordenar y desplazar el filtrado)
+# 2) Nos quedamos SOLO con filas actuales que sean NoContacto / Inubicado (ya filtradas en la carga)
+# 3) Minutos netos del intervalo previo→actual (solo tiempo laborable del calendario), precalculados y agregados en el cubo
+codigos_permitidos = CODIGOS_PERMITIDOS
+with stage("cubo", len(nc_all)) as etapa:
+    if store:
+        analisis = get_ingest_cache().get(f"{clave_ingesta}-{breaks_signature(calendario)}",
+                                          lambda: store.load_analysis(calendario), persist=False)
+    else:
+        analisis = load_cube(clave_ingesta, nc_all, calendario, get_ingest_cache())
+    etapa.filas_salida = len(analisis["cubo"])
+cubo, cubo_horas, filas = analisis["cubo"], analisis["cubo_horas"], analisis["filas"]
+with stage("filtros", len(cubo)) as etapa:
+    en_rango, cuenta = cube_masks(cubo, start_date, end_date, gestores_seleccionados, min_interval)
+    etapa.filas_salida = int(en_rango.sum())
+if not en_rango.any():
     st.warning("No hay registros con GstCodigo en {'NoContacto','Inubicado'} para los filtros seleccionados.")
     st.stop()
 
 st.caption(
     f"Se consideran **solo** filas con `GstCodigo` en {sorted(list(codigos_permitidos))}, "
     f"pero el **intervalo** se calcula contra la gestión **previa real** (sea del código que sea). "
-    + (f"(Refrigerio excluido: **{ref_inicio.strftime('%H:%M')}–{ref_fin.strftime('%H:%M')}**)" if excluir_refrigerio else "(Sin exclusión de refrigerio)")
+    + f"({nota_calendario}.)"
 )
 
-# 3) Minutos netos del intervalo previo→actual (restando refrigerio)
-df_nc["minutos_netos"] = df_nc.apply(
-    lambda r: minutes_excluding_breaks(r["prev_any"], r["datetime"], breaks_cfg), axis=1
-)
-
-# 4) Umbral y dataset final de tiempos sin gestión
-df_sin = df_nc[df_nc["minutos_netos"] >= float(min_interval)].copy()
-df_sin["minutos_sin_gestion"] = df_sin["minutos_netos"]
-df_sin["intervalo_hhmm"] = df_sin["minutos_sin_gestion"].apply(fmt_hhmm_from_minutes)
-df_sin["hhmm"] = df_sin["minutos_sin_gestion"].apply(fmt_hhmm_from_minutes)
+# 4) Umbral y dataset final de tiempos sin gestión (el detalle se arma en su pestaña)
+hay_sin_gestion = bool(cuenta.any())
+clave_filtros = (clave_ingesta, breaks_signature(calendario), start_date, end_date,
+                 tuple(gestores_seleccionados), min_interval)
 
 # ========= Agregados =========
-intentos_por_gestor = (df_nc.groupby("Gestor", as_index=False).size()
-                       .rename(columns={"size": "intentos_nc_inu"}))
-tot_por_gestor = (df_sin.groupby("Gestor", as_index=False)["minutos_sin_gestion"].sum()
-                  .sort_values("minutos_sin_gestion", ascending=False))
-resumen_gestor = pd.merge(intentos_por_gestor, tot_por_gestor, on="Gestor", how="left").fillna({"minutos_sin_gestion": 0})
-resumen_gestor["hhmm_total"] = resumen_gestor["minutos_sin_gestion"].apply(fmt_hhmm_from_minutes)
+with stage("resumen_gestor", int(en_rango.sum())) as etapa:
+    resumen_gestor = memo("resumen_gestor", clave_filtros, lambda: gestor_summary(cubo, en_rango, cuenta))
+    etapa.filas_salida = len(resumen_gestor)
 
 # ========= KPIs =========
 total_min = resumen_gestor["minutos_sin_gestion"].sum()
@@ -261,36 +573,32 @@ promedio_por_gestor_min = resumen_gestor["minutos_sin_gestion"].mean() if not re
 gestor_max = resumen_gestor.sort_values("minutos_sin_gestion", ascending=False)["Gestor"].iloc[0] if not resumen_gestor.empty else "—"
 
 # ========= Tabs =========
+# Cada pestaña es un fragmento: sus widgets solo re-ejecutan esa pestaña (no la carga ni las demás),
+# y sus resultados se memorizan en la caché compartida según sus propias entradas.
 tab_kpi, tab_barras, tab_heatmap, tab_matriz, tab_detalle = st.tabs([
     "📌 KPIs", "📊 Barras por Gestor", "🔥 Mapa de calor Hora × Día", "🧮 Matriz Hora × Gestor", "📋 Detalle"
 ])
 
-with tab_kpi:
-    st.subheader("🔎 Métricas clave")
-    c1, c2, c3 = st.columns(3)
-    c1.metric("⏱ Total (todos los gestores filtrados)", f"{fmt_hhmm_from_minutes(total_min)} h")
-    c2.metric("📊 Promedio por Gestor", f"{fmt_hhmm_from_minutes(promedio_por_gestor_min)} h")
-    c3.metric("👤 Gestor con más tiempo sin gestión", gestor_max)
-
-    # ——— Cards profesionales por gestor ———
-    st.markdown("### 🧑‍💼 Tiempo sin gestión por Gestor (HH:MM)")
-
-    # Control Top N (independiente del de Barras)
-    n_total = len(resumen_gestor)
-    if n_total > 4:
-        top_n_cards = st.slider("Mostrar Top N", min_value=4, max_value=min(20, n_total),
-                                value=min(8, n_total), key="top_n_cards")
-    else:
-        top_n_cards = n_total
-        st.caption("Se muestran todos los gestores seleccionados.")
-
-    render_gestor_cards(resumen_gestor, total_min, top_n=top_n_cards, key="gestor")
-
-with tab_barras:
-    st.subheader("Minutos sin gestión por Gestor")
-    if resumen_gestor.empty or resumen_gestor["minutos_sin_gestion"].sum() == 0:
-        st.info("No hay intervalos que cumplan el umbral seleccionado.")
-    else:
+@st.fragment
+def kpi_tab(resumen_gestor, total_min, promedio_por_gestor_min, gestor_max):
+    with stage("tab_kpi"):
+        st.subheader("🔎 Métricas clave")
+        c1, c2, c3 = st.columns(3)
+        c1.metric("⏱ Total (todos los gestores filtrados)", f"{fmt_hhmm_from_minutes(total_min)} h")
+        c2.metric("📊 Promedio por Gestor", f"{fmt_hhmm_from_minutes(promedio_por_gestor_min)} h")
+        c3.metric("👤 Gestor con más tiempo sin gestión", gestor_max)
+
+        # ——— Cards profesionales por gestor ———
+        st.markdown("### 🧑‍💼 Tiempo sin gestión por Gestor (HH:MM)")
+        render_gestor_cards(resumen_gestor, total_min, key="gestor")
+
+@st.fragment
+def barras_tab(resumen_gestor):
+    with stage("tab_barras"):
+        st.subheader("Minutos sin gestión por Gestor")
+        if resumen_gestor.empty or resumen_gestor["minutos_sin_gestion"].sum() == 0:
+            st.info("No hay intervalos que cumplan el umbral seleccionado.")
+            return
         data_top = resumen_gestor.sort_values("minutos_sin_gestion", ascending=False).copy()
         n_g = len(data_top)
         if n_g > 1:
@@ -313,18 +621,14 @@ with tab_barras:
             ).properties(height=max(300, 22*len(data_top)), width='container'))
         st.altair_chart(bars, use_container_width=True)
 
-with tab_heatmap:
-    st.subheader("Concentración por Hora × Día (minutos netos)")
-    if df_sin.empty:
-        st.info("No hay intervalos que cumplan el umbral.")
-    else:
-        tmp = df_sin[["datetime", "minutos_sin_gestion"]].copy()
-        tmp["hora"] = tmp["datetime"].dt.hour
-        tmp["weekday_num"] = tmp["datetime"].dt.weekday
-        dias = {0:"Lun",1:"Mar",2:"Mié",3:"Jue",4:"Vie",5:"Sáb",6:"Dom"}
-        tmp["dia_semana"] = tmp["weekday_num"].map(dias)
-        heat = tmp.groupby(["dia_semana","weekday_num","hora"], as_index=False)["minutos_sin_gestion"].sum()
-        heat["hhmm"] = heat["minutos_sin_gestion"].apply(fmt_hhmm_from_minutes)
+@st.fragment
+def heatmap_tab(clave_filtros, cubo, cuenta):
+    with stage("tab_heatmap"):
+        st.subheader("Concentración por Hora × Día (minutos netos)")
+        if not cuenta.any():
+            st.info("No hay intervalos que cumplan el umbral.")
+            return
+        heat = memo("heatmap", clave_filtros, lambda: heatmap_table(cubo, cuenta))
         chart = (alt.Chart(heat).mark_rect().encode(
             x=alt.X("hora:O", title="Hora"),
             y=alt.Y("dia_semana:O", sort=["Lun","Mar","Mié","Jue","Vie","Sáb","Dom"]),
@@ -337,11 +641,13 @@ with tab_heatmap:
             ]).properties(height=240, width='container'))
         st.altair_chart(chart, use_container_width=True)
 
-with tab_matriz:
-    st.subheader("Detalle por Gestor × Rango horario (formato HH:MM )")
-    if df_sin.empty:
-        st.info("No hay intervalos que cumplan el umbral.")
-    else:
+@st.fragment
+def matriz_tab(clave_filtros, analisis, hay_sin_gestion, start_date, end_date, gestores, min_interval, breaks):
+    with stage("tab_matriz"):
+        st.subheader("Detalle por Gestor × Rango horario (formato HH:MM )")
+        if not hay_sin_gestion:
+            st.info("No hay intervalos que cumplan el umbral.")
+            return
         c0, c1, c2, c3 = st.columns(4)
         usar_solapamiento = c0.checkbox("Atribución exacta por solapamiento", value=True,
                                         help="Reparte cada intervalo entre las horas que cruza y excluye refrigerio.")
@@ -351,77 +657,110 @@ with tab_matriz:
 
         if end_h <= start_h:
             st.warning("La hora fin debe ser mayor que la hora inicio.")
-        else:
-            all_cols = [f"{h:02d}a{(h+1):02d}" for h in range(start_h, end_h)]
-
-            if usar_solapamiento:
-                rows = []
-                # OJO: usamos prev_any calculado sobre TODO el set
-                for _, r in df_sin[["Gestor","prev_any","datetime","minutos_sin_gestion"]].iterrows():
-                    parts = split_interval_by_hours_excl_breaks(r["prev_any"], r["datetime"], breaks_cfg, start_h, end_h)
-                    for hour, mins in parts:
-                        rows.append({"Gestor": r["Gestor"], "col_etiqueta": f"{hour:02d}a{(hour+1):02d}", "minutos": float(mins)})
-                agg = pd.DataFrame(rows, columns=["Gestor","col_etiqueta","minutos"]).dropna()
-                value_col = "minutos"
-            else:
-                tmp = df_sin[["Gestor", "datetime", "minutos_sin_gestion"]].copy()
-                tmp["hora"] = tmp["datetime"].dt.hour
-                tmp = tmp[(tmp["hora"] >= start_h) & (tmp["hora"] < end_h)]
-                tmp["col_etiqueta"] = tmp["hora"].apply(lambda h: f"{h:02d}a{(h+1):02d}")
-                agg = tmp.rename(columns={"minutos_sin_gestion": "minutos"})[["Gestor","col_etiqueta","minutos"]]
-                value_col = "minutos"
-
-            if agg.empty:
-                st.info("No hay minutos acumulados en el rango horario seleccionado.")
-            else:
-                # consolidar y pivot_table para evitar duplicados
-                agg = agg.groupby(["Gestor","col_etiqueta"], as_index=False)[value_col].sum()
-                matriz = pd.pivot_table(agg, index="Gestor", columns="col_etiqueta",
-                                        values=value_col, aggfunc="sum", fill_value=0.0).astype(float).copy()
-                for c in all_cols:
-                    if c not in matriz.columns: matriz[c] = 0.0
-                matriz = matriz[all_cols].sort_index()
-                matriz["Total_min"] = matriz.sum(axis=1)
-                total_row = pd.DataFrame(matriz.sum(axis=0)).T; total_row.index = ["TOTAL_GENERAL"]
-                matriz = pd.concat([matriz, total_row])
-
-                matriz_hhmm = matriz.copy()
-                for c in all_cols + ["Total_min"]:
-                    matriz_hhmm[c] = matriz_hhmm[c].apply(fmt_hhmm_from_minutes)
-
-                def highlight_threshold(v):
-                    try: val = float(v)
-                    except Exception: val = 0.0
-                    return "background-color:#ffe5e5; color:#b00000; font-weight:bold;" if val > umbral_rojo else ""
-
-                styler = (matriz.style
-                          .format({c: fmt_hhmm_from_minutes for c in all_cols + ["Total_min"]})
-                          .background_gradient(axis=None, cmap="Blues", subset=all_cols)
-                          .applymap(highlight_threshold, subset=all_cols)
-                          .set_properties(**{"text-align": "center", "font-family": "monospace"})
-                          .set_table_styles([
-                              {"selector": "th.col_heading", "props": [("text-align", "center")]},
-                              {"selector": "th.row_heading", "props": [("text-align", "left")]},
-                              {"selector": "thead th", "props": [("background-color", "#f6f8fa")]}
-                          ])
-                          .set_properties(subset=pd.IndexSlice[["TOTAL_GENERAL"], :], **{"font-weight": "bold"}))
-                st.dataframe(styler, use_container_width=True)
-
-                # Descargar
-                import io
-                buffer = io.BytesIO()
-                with pd.ExcelWriter(buffer, engine="xlsxwriter") as writer:
-                    matriz.to_excel(writer, sheet_name="Matriz_minutos")
-                    matriz_hhmm.to_excel(writer, sheet_name="Matriz_hhmm")
-                st.download_button("📥 Descargar matriz (Excel)", data=buffer.getvalue(),
-                                   file_name="matriz_horas_gestor.xlsx",
-                                   mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+            return
+        params = AnalysisParams(min_interval=min_interval, breaks=tuple(breaks), gestores=tuple(gestores),
+                                start_h=int(start_h), end_h=int(end_h), overlap=usar_solapamiento)
+        clave_matriz = (clave_filtros, usar_solapamiento, int(start_h), int(end_h))
+        origen = analisis["cubo_horas"] if usar_solapamiento else analisis["cubo"]
+        with stage("matriz", len(origen)) as etapa:
+            matrices = memo("matriz", clave_matriz, lambda: hour_matrix(analisis, params, start_date, end_date))
+            etapa.filas_salida = 0 if matrices is None else len(matrices[0])
+
+        if matrices is None:
+            st.info("No hay minutos acumulados en el rango horario seleccionado.")
+            return
+        matriz, matriz_hhmm = matrices
+
+        with stage("styler", len(matriz)):
+            styler = style_matrix(matriz, umbral_rojo)
+            st.dataframe(styler, use_container_width=True)
+
+        # Descargar
+        st.markdown("#### 📥 Exportar matriz")
+        export_section("matriz", clave_matriz, lambda: {"Matriz_minutos": matrix_frame(matriz),
+                                                        "Matriz_hhmm": matrix_frame(matriz_hhmm)},
+                       stem="matriz_horas_gestor")
+
+@st.fragment
+def detalle_tab(clave_filtros, filas, resumen_gestor, start_date, end_date, gestores, min_interval, nota_calendario):
+    with stage("tab_detalle"):
+        st.subheader("Detalles de Tiempos Sin Gestión (minutos netos)")
+
+        def build():
+            df_sin = detail_rows(filas, start_date, end_date, gestores, min_interval)
+            return df_sin.sort_values(by=["Gestor","datetime"]).reset_index(drop=True)
+        with stage("detalle", len(filas)) as etapa:
+            df_sin = memo("detalle", clave_filtros, build)
+            ordenes = memo("detalle_ordenes", clave_filtros, lambda: detail_sort_orders(df_sin))
+            etapa.filas_salida = len(df_sin)
+
+        # Búsqueda, orden y paginación del lado del servidor: al navegador solo viaja la página visible
+        c1, c2, c3, c4 = st.columns([2, 2, 1, 2])
+        buscar = c1.text_input("Buscar Gestor", key="detalle_buscar", placeholder="Nombre o parte del nombre")
+        rango = c2.date_input("Fechas", value=(start_date, end_date), min_value=start_date, max_value=end_date,
+                              key=f"detalle_fechas_{start_date}_{end_date}")
+        desde, hasta = rango if isinstance(rango, (list, tuple)) and len(rango) == 2 else (start_date, end_date)
+        min_minutos = c3.number_input("Minutos mín.", min_value=float(min_interval), value=float(min_interval),
+                                      step=1.0, key=f"detalle_min_{min_interval}")
+        orden = c4.selectbox("Orden", list(ORDENES_DETALLE), key="detalle_orden")
+        mask = detail_mask(df_sin, buscar, desde, hasta, min_minutos)
+
+        firma = (clave_filtros, buscar, desde, hasta, min_minutos, orden)
+        if st.session_state.get("_detalle_firma") != firma:
+            st.session_state["_detalle_firma"] = firma
+            st.session_state["detalle_pagina"] = 1
+        p1, p2 = st.columns([1, 3])
+        page_size = p1.selectbox("Filas por página", TAMANOS_PAGINA, index=1, key="detalle_tam_pagina")
+        n_filtradas = int(mask.sum())
+        n_paginas = max(1, math.ceil(n_filtradas / page_size))
+        st.session_state["detalle_pagina"] = min(st.session_state.get("detalle_pagina", 1), n_paginas)
+        pagina = p2.number_input(f"Página (de {n_paginas:,})", min_value=1, max_value=n_paginas, step=1,
+                                 key="detalle_pagina")
+        with stage("detalle_pagina", n_filtradas) as etapa:
+            pos, _ = paginate(ordenes[orden], mask, int(pagina), page_size)
+            pagina_df = df_sin.iloc[pos][COLUMNAS_DETALLE]
+            etapa.filas_salida = len(pagina_df)
+        st.dataframe(pagina_df, use_container_width=True, hide_index=True)
+        inicio = (int(pagina) - 1) * page_size
+        st.caption(f"Filas {inicio + 1 if len(pagina_df) else 0:,}–{inicio + len(pagina_df):,} de {n_filtradas:,}"
+                   + (f" (de {len(df_sin):,} sin búsqueda)" if n_filtradas != len(df_sin) else "") + ".")
+        st.caption("El intervalo se calcula entre la **gestión previa real** y la fila actual (solo si es NoContacto/Inubicado). "
+                   + f"{nota_calendario}.")
+
+        st.markdown("#### 📥 Exportar")
+        contenido = st.radio("Contenido", ["Detalle", "Resumen por Gestor", "Detalle + Resumen"],
+                             horizontal=True, key="export_detalle_contenido")
+        tablas = {"Detalle": lambda: {"Detalle": df_sin[COLUMNAS_DETALLE]},
+                  "Resumen por Gestor": lambda: {"Resumen_gestor": resumen_gestor},
+                  "Detalle + Resumen": lambda: {"Resumen_gestor": resumen_gestor, "Detalle": df_sin[COLUMNAS_DETALLE]}}
+        export_section("detalle", (clave_filtros, contenido), tablas[contenido], stem="tiempo_sin_gestion")
 
+with tab_kpi:
+    kpi_tab(resumen_gestor, total_min, promedio_por_gestor_min, gestor_max)
+with tab_barras:
+    barras_tab(resumen_gestor)
+with tab_heatmap:
+    heatmap_tab(clave_filtros, cubo, cuenta)
+with tab_matriz:
+    matriz_tab(clave_filtros, analisis, hay_sin_gestion, start_date, end_date,
+               gestores_seleccionados, min_interval, breaks_cfg)
 with tab_detalle:
-    st.subheader("Detalles de Tiempos Sin Gestión (minutos netos)")
-    if not df_sin.empty:
-        df_sin = df_sin.sort_values(by=["Gestor","datetime"])
-    cols = ["Gestor","datetime","GstCodigo","intervalo_hhmm","hhmm","minutos_sin_gestion"]
-    st.dataframe(df_sin[cols], use_container_width=True)
-    st.caption("El intervalo se calcula entre la **gestión previa real** y la fila actual (solo si es NoContacto/Inubicado). "
-               + ("Se excluye refrigerio." if excluir_refrigerio else "No se excluye refrigerio."))
+    detalle_tab(clave_filtros, filas, resumen_gestor, start_date, end_date, gestores_seleccionados, min_interval,
+                nota_calendario)
+
+# ========= Diagnóstico =========
+if recorder:
+    render_perf_panel(recorder, {
+        "archivo": getattr(uploaded_file, "name", None),
+        "bytes": getattr(uploaded_file, "size", None),
+        "modo": "acumulado" if store else ("por bloques" if carga_por_bloques else "completo"),
+        "filas_export": int(reporte["filas"]),
+        "relectura_completa": bool(reporte.get("relectura_completa", False)),
+        "filas_nc_inu": len(nc_all),
+        "desde": start_date.isoformat(), "hasta": end_date.isoformat(),
+        "gestores": len(gestores_seleccionados),
+        "intervalo_min": min_interval,
+        **{f"calendario_{k}": v for k, v in resumen_cal.items()},
+        **{f"cache_{k}": v for k, v in get_ingest_cache().usage().items()},
+    })
+    recorder.close()